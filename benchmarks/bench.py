@@ -0,0 +1,321 @@
+'''Benchmarks for the Python checker and the region pipeline.
+
+    python benchmarks/bench.py [--repeat N] [--case NAME]...
+    python benchmarks/bench.py --save-baseline
+    python benchmarks/bench.py --threshold 1.5
+
+Each case of the generated corpus (see corpus.py) is linted the way the
+plugin does it, outside of Sublime Text (sublime.py in this directory
+stands in for the editor's module).  For every case, the best time out
+of --repeat runs is reported for:
+
+    total       python.analyze(), i.e. what a lint of the buffer costs
+    compile     the syntax check: parsing, and compiling the parse tree
+    parse       the transformation of the parse tree into the checked tree
+    walk        the Checker's walk of the tree
+    deferred    the deferred function bodies and assignments
+    dead_scopes the unused import check
+    underline   what python.analyze() adds to check(): line remapping
+                and placement of the underlines
+    regions     conversion of the results into editor regions
+    notes       the annotation scan
+
+as well as the peak memory of a process linting the case once, and the
+memory held by the scopes, bindings and messages of the Checker (see
+checker_memory()) - the parse tree dwarfs them in the peak.  Results are
+compared to baseline.json; the command exits with status 1 when a
+measure exceeds its baseline by more than --threshold (a ratio).  Times
+are first scaled by the speed of the machine relative to the one which
+recorded the baseline, measured with a fixed pure Python workload.
+'''
+import gc
+import json
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+BASELINE = os.path.join(BENCHMARKS, 'baseline.json')
+PHASES = ['total', 'compile', 'parse', 'walk', 'deferred', 'dead_scopes',
+          'underline', 'regions', 'notes']
+MEMORY = ['checker_kb', 'peak_kb']
+# measures shorter than this are too noisy to be compared to a baseline
+MINIMUM = 0.005
+
+sys.path[:0] = [BENCHMARKS, ROOT]
+os.chdir(ROOT)  # the plugin loads the linter modules from the current dir
+
+import corpus
+
+
+def load_plugin():
+    '''imports the plugin and its linters, hiding the loading messages'''
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        import sublimelint_plugin
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return sublimelint_plugin
+
+
+plugin = load_plugin()
+python = plugin.LINTERS['Python']
+notes = plugin.LINTERS['annotations']
+
+
+class Timer(object):
+    '''accumulates the time spent in named phases'''
+    def __init__(self):
+        self.times = {}
+
+    def add(self, phase, elapsed):
+        self.times[phase] = self.times.get(phase, 0.0) + elapsed
+
+    def call(self, phase, function, *args):
+        start = time.time()
+        try:
+            return function(*args)
+        finally:
+            self.add(phase, time.time() - start)
+
+
+class TimedChecker(python.Checker):
+    '''Checker timing the deferred functions and the dead scope check;
+       the walk is what remains of the time spent creating it'''
+    timer = None
+
+    def _runDeferred(self, deferred):
+        self.timer.call('deferred', python.Checker._runDeferred, self,
+                        deferred)
+
+    def check_dead_scopes(self):
+        self.timer.call('dead_scopes', python.Checker.check_dead_scopes,
+                        self)
+
+
+def checker_phases(timer, text):
+    '''times the phases of python.check() one by one'''
+    text = text.rstrip().encode('utf-8')
+    try:
+        syntax_tree = timer.call('compile', python.parser.suite, text)
+        timer.call('compile', syntax_tree.compile, 'bench')
+    except SyntaxError:
+        return
+    tree = timer.call('parse', python.transformer.Transformer().transform,
+                      syntax_tree)
+    TimedChecker.timer = timer
+    start = time.time()
+    checker = TimedChecker(tree, 'bench')
+    elapsed = time.time() - start
+    timer.add('walk', elapsed - timer.times['deferred'] -
+                                            timer.times['dead_scopes'])
+    return checker
+
+
+def checker_memory(checker):
+    '''memory (in KB) of the scopes, bindings and messages of a Checker,
+       counting each distinct name string once'''
+    seen = set()
+
+    def size(thing):
+        if id(thing) in seen:
+            return 0
+        seen.add(id(thing))
+        total = sys.getsizeof(thing)
+        if hasattr(thing, '__dict__'):
+            total += sys.getsizeof(thing.__dict__)
+        return total
+
+    total = 0
+    for scope in checker.dead_scopes:
+        total += size(scope)
+        for name, binding in scope.iteritems():
+            total += size(name) + size(binding) + size(binding.name)
+    for message in checker.messages:
+        total += size(message)
+    return total // 1024
+
+
+def run_case(text, python_case=True):
+    '''lints text once; returns the time spent in each phase'''
+    timer = Timer()
+    gc.collect()
+    if python_case:
+        check = python.check
+        python.check = lambda *args: timer.call('check', check, *args)
+        try:
+            underlines, lines, errors = timer.call('total', python.analyze,
+                                                            text, 'bench')
+        finally:
+            python.check = check
+        timer.add('underline', timer.times['total'] - timer.times['check'])
+        underlined, outlines = timer.call('regions', plugin.lint_marks,
+                                          text, underlines, lines)
+        timer.call('regions', plugin.underline_regions, underlined)
+        del underlines, lines, errors, underlined, outlines
+        gc.collect()
+        checker = checker_phases(timer, text)
+        if checker is not None:
+            timer.times['checker_kb'] = checker_memory(checker)
+    timer.call('notes', notes.analyze, text, 'bench', {})
+    timer.times.pop('check', None)
+    if not python_case:
+        timer.times['total'] = timer.times['notes']
+    return timer.times
+
+
+def calibrate(repeat):
+    '''best time of a fixed workload, used to compare machines'''
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        table = {}
+        for number in xrange(200000):
+            table[str(number % 1000)] = number
+        elapsed = time.time() - start
+        best = min(best or elapsed, elapsed)
+    return best
+
+
+def best_of(name, repeat):
+    '''lints a case repeat times and keeps the best time of each phase'''
+    text = corpus.generate(name)
+    python_case = name != 'annotations'
+    best = {}
+    for _ in range(repeat):
+        for phase, elapsed in run_case(text, python_case).iteritems():
+            best[phase] = min(best.get(phase, elapsed), elapsed)
+    best['lines'] = text.count('\n')
+    return best
+
+
+def peak_memory(name):
+    '''peak memory (in KB) of a fresh process linting a case once'''
+    output = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                               '--case', name, '--memory-only'],
+                              stdout=subprocess.PIPE).communicate()[0]
+    return int(output.strip())
+
+
+def own_peak_memory():
+    '''peak memory (in KB) of this process'''
+    try:
+        # unlike ru_maxrss, this is not inherited from the parent process
+        for line in open('/proc/self/status'):
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    except IOError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def compare(results, baseline, threshold):
+    '''returns descriptions of the measures slower than their baseline'''
+    regressions = []
+    speed = 1.0
+    if 'calibration' in results and 'calibration' in baseline:
+        speed = results['calibration'] / baseline['calibration']
+    for name in sorted(results):
+        if name not in baseline or name == 'calibration':
+            continue
+        for measure in PHASES + MEMORY:
+            old = baseline[name].get(measure)
+            new = results[name].get(measure)
+            if old is None or new is None:
+                continue
+            if measure not in MEMORY:
+                if max(old, new) < MINIMUM:
+                    continue
+                old *= speed
+            if new > old * threshold:
+                regressions.append('%s %s: %.4g -> %.4g (x%.2f)' % (
+                                        name, measure, old, new, new / old))
+    return regressions
+
+
+def report(results, output=sys.stdout):
+    '''writes a table of the results, in milliseconds'''
+    header = ['case', 'lines'] + PHASES + MEMORY
+    output.write(''.join(['%-13s' % header[0]] +
+                         ['%12s' % column for column in header[1:]]) + '\n')
+    for name in sorted(results):
+        if name == 'calibration':
+            continue
+        row = ['%-13s' % name, '%12d' % results[name]['lines']]
+        for phase in PHASES:
+            if phase in results[name]:
+                row.append('%12.2f' % (results[name][phase] * 1000))
+            else:
+                row.append('%12s' % '-')
+        for measure in MEMORY:
+            row.append('%12s' % results[name].get(measure, '-'))
+        output.write(''.join(row) + '\n')
+
+
+def main(argv=None):
+    '''entry point of the command'''
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--case', action='append', dest='cases',
+                      help='run only this case (may be repeated)')
+    parser.add_option('--repeat', type='int', default=5,
+                      help='number of runs of each case (default: 5)')
+    parser.add_option('--no-memory', dest='memory', action='store_false',
+                      default=True, help='do not measure the peak memory')
+    parser.add_option('--memory-only', action='store_true', default=False,
+                      help=optparse.SUPPRESS_HELP)
+    parser.add_option('--baseline', default=BASELINE,
+                      help='baseline file (default: benchmarks/baseline.json)')
+    parser.add_option('--save-baseline', action='store_true', default=False,
+                      help='write the results to the baseline file')
+    parser.add_option('--threshold', type='float', default=1.5,
+                      help='slowdown ratio counted as a regression '
+                           '(default: 1.5)')
+    parser.add_option('--json', action='store_true', default=False,
+                      help='write the results as JSON')
+    options, args = parser.parse_args(argv)
+    cases = options.cases or sorted(corpus.CASES)
+
+    if options.memory_only:
+        run_case(corpus.generate(cases[0]), cases[0] != 'annotations')
+        print own_peak_memory()
+        return 0
+
+    results = {'calibration': calibrate(options.repeat)}
+    for name in cases:
+        results[name] = best_of(name, options.repeat)
+    if options.memory:
+        for name in cases:
+            results[name]['peak_kb'] = peak_memory(name)
+
+    if options.json:
+        json.dump(results, sys.stdout, indent=1, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        report(results)
+
+    if options.save_baseline:
+        output = open(options.baseline, 'w')
+        try:
+            json.dump(results, output, indent=1, sort_keys=True)
+            output.write('\n')
+        finally:
+            output.close()
+        return 0
+
+    if not os.path.exists(options.baseline):
+        return 0
+    baseline = json.load(open(options.baseline))
+    regressions = compare(results, baseline, options.threshold)
+    for regression in regressions:
+        print >> sys.stderr, 'regression: %s' % regression
+    return int(bool(regressions))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
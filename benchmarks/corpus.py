@@ -0,0 +1,182 @@
+'''Generated Python sources used by the benchmarks.
+
+Every case is generated from a fixed seed so that timings can be compared
+from one run to the next.  Run this module with a directory name to write
+the corpus to disk, e.g. for the command line linter:
+
+    python benchmarks/corpus.py /tmp/corpus
+'''
+import os
+import random
+import sys
+
+STDLIB = ['os', 'sys', 're', 'json', 'time', 'random', 'math', 'string',
+          'socket', 'struct', 'shutil', 'tempfile', 'threading', 'logging',
+          'itertools', 'functools', 'operator', 'collections', 'glob', 'copy']
+NOTES = ['TODO', 'FIXME', 'XXX', 'HACK', 'README']
+
+
+def function(rng, name, depth=1, errors=False):
+    '''source of a function with a few locals, loops and calls'''
+    indent = '    ' * depth
+    lines = ['%sdef %s(self, alpha, beta=None, *args, **kwargs):' % (
+                                                    indent[4:], name),
+             '%s"""%s docstring"""' % (indent, name),
+             '%s# %s: check the bounds' % (indent, rng.choice(NOTES)),
+             '%stotal = alpha' % indent,
+             '%sfor index, value in enumerate(args):' % indent,
+             '%s    if value and index %% 2:' % indent,
+             '%s        total = total + value * index' % indent,
+             '%s    elif beta is not None:' % indent,
+             '%s        total -= len(str(beta))' % indent,
+             '%sresult = [item for item in kwargs if item.startswith("_")]' %
+                                                                    indent,
+             '%smapping = dict((key, os.path.join(key, "x")) for key in result)'
+                                                                    % indent,
+             '%stry:' % indent,
+             '%s    handle = open(mapping.get("path", "/dev/null"))' % indent,
+             '%sexcept IOError, excp:' % indent,
+             '%s    handle = None' % indent]
+    if errors:
+        lines.extend([
+             '%sunused_%s = alpha + 1' % (indent, name),
+             '%sreturn undefined_%s.attribute.chain + total + handle' % (
+                                                            indent, name)])
+    else:
+        lines.append('%sreturn total, handle' % indent)
+    return lines
+
+
+def module(rng, classes, methods, functions, errors=False):
+    '''source of a module with classes and top level functions'''
+    lines = ['"""generated module"""', '']
+    for name in STDLIB[:10]:
+        lines.append('import %s' % name)
+    if errors:
+        lines.extend(['import %s' % name for name in STDLIB[10:]])
+    lines.append('')
+    for number in range(classes):
+        lines.append('class Generated%d(object):' % number)
+        lines.append('    """class number %d"""' % number)
+        lines.append('    limit = %d' % rng.randint(0, 1000))
+        for method in range(methods):
+            lines.extend(function(rng, 'method_%d' % method, 2,
+                                  errors and rng.random() < 0.5))
+            lines.append('')
+        lines.append('')
+    for number in range(functions):
+        lines.extend(function(rng, 'function_%d' % number, 1,
+                              errors and rng.random() < 0.5))
+        if errors and number % 7 == 0:
+            # redefinition of an unused function
+            lines.extend(function(rng, 'function_%d' % number, 1))
+        lines.append('')
+    lines.append('if __name__ == "__main__":')
+    lines.append('    print sys.argv, re.compile("x"), json.dumps(1), '
+                 'time.time(), random.random(), math.pi, string.digits, '
+                 'socket.AF_INET, struct.pack')
+    return '\n'.join(lines) + '\n'
+
+
+def deep_nesting(rng, depth=42):
+    '''functions and classes nested inside each other'''
+    lines = ['import os', '']
+    for level in range(depth):
+        indent = '    ' * level
+        if level % 5 == 4:
+            lines.append('%sclass Level%d(object):' % (indent, level))
+        else:
+            lines.append('%sdef level_%d(value_%d):' % (indent, level, level))
+        lines.append('%s    local_%d = [value_%d for value_%d in range(%d)]' % (
+                                        indent, level, level, level, level))
+        lines.append('%s    callback_%d = lambda item: item + local_%d[0]' % (
+                                                    indent, level, level))
+    indent = '    ' * depth
+    lines.append(indent + 'return ' + ' + '.join(
+                        'local_%d[0]' % level for level in range(depth)
+                        if level % 5 != 4))
+    return '\n'.join(lines) + '\n'
+
+
+def many_imports(rng, count=3000):
+    '''thousands of import statements, half of them unused'''
+    lines = []
+    for number in range(count):
+        kind = number % 3
+        if kind == 0:
+            lines.append('import package_%d.module_%d' % (number % 97, number))
+        elif kind == 1:
+            lines.append('from package_%d import name_%d' % (number % 89,
+                                                                    number))
+        else:
+            lines.append('from package_%d import name_%d as alias_%d' % (
+                                                number % 83, number, number))
+    lines.append('')
+    lines.append('def use():')
+    for number in range(0, count, 2):
+        name = ['package_%d' % (number % 97), 'name_%d' % number,
+                'alias_%d' % number][number % 3]
+        lines.append('    %s.run()' % name)
+    return '\n'.join(lines) + '\n'
+
+
+def many_names(rng, functions=500, names=50):
+    '''functions binding tens of thousands of local names'''
+    lines = ['import os', '']
+    for number in range(functions):
+        lines.append('def names_%d(first, second):' % number)
+        for name in range(names):
+            lines.append('    name_%d = first + second * %d' % (name,
+                                                    rng.randint(0, 9)))
+        lines.append('    return ' + ' + '.join(
+                        'name_%d' % name for name in range(0, names, 2)))
+        lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def syntax_error(rng):
+    '''a medium sized module with a syntax error near its end'''
+    source = module(rng, 20, 5, 20)
+    return source + 'def broken(:\n    pass\n'
+
+
+def annotations(rng, lines=20000):
+    '''a large text file full of annotations'''
+    words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon'] + NOTES
+    return '\n'.join(' '.join(rng.choice(words) for _ in range(12))
+                                        for _ in range(lines)) + '\n'
+
+
+CASES = {
+    'small': lambda rng: module(rng, 1, 3, 3),
+    'medium': lambda rng: module(rng, 20, 5, 30),
+    'huge': lambda rng: module(rng, 100, 8, 150),
+    'deep_nesting': deep_nesting,
+    'many_imports': many_imports,
+    'many_names': many_names,
+    'many_errors': lambda rng: module(rng, 30, 5, 60, errors=True),
+    'syntax_error': syntax_error,
+    'annotations': annotations,
+}
+
+
+def generate(name, seed=1):
+    '''returns the source of a benchmark case'''
+    return unicode(CASES[name](random.Random(seed)))
+
+
+def write(directory):
+    '''writes the whole corpus to a directory'''
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for name in sorted(CASES):
+        extension = name == 'annotations' and '.txt' or '.py'
+        output = open(os.path.join(directory, name + extension), 'w')
+        try:
+            output.write(generate(name).encode('utf-8'))
+        finally:
+            output.close()
+
+
+if __name__ == '__main__':
+    write(sys.argv[1])
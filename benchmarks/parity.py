@@ -0,0 +1,72 @@
+'''Checks that the resident helpers report what the one-shot commands do.
+
+    python benchmarks/parity.py
+
+The Ruby and PHP linters can check code with a resident helper process
+(see sublimelint/daemons.py) or with a new "ruby -wc" or "php -l" process
+for each check; since the option is part of the cache key of the results,
+both must give the same messages on the same lines.  Every sample below is
+linted both ways, and the differences are reported; the command exits with
+status 1 if there are any.  Languages whose interpreter is not installed
+are skipped.
+'''
+from distutils.spawn import find_executable
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sublimelint.modules import php, ruby
+
+SAMPLES = {
+    ruby: ['x = 1\n',
+           'x = 1\nif x\n  y = 2\nend\ndef g\n  a = 1\nend\n',
+           '[1].each { |v| w = v }\nfor i in [1]; k = 1; end\n'
+                                            'class C; t = 1; end\n',
+           'x = 1\nputs(x) if x = 2\n',
+           'a, b = 1, 2\nputs a\n__END__\nq = 2\n',
+           '# encoding: utf-8\nname = "\xc3\xa9t\xc3\xa9"\n',
+           'def f(\n',
+           'class A\n  def g\n    1\n  end\n',
+           'puts "unterminated\n'],
+    php: ['<?php\n$x = 1;\n',
+          '<?php\nfunction f() {\n  return 1;\n}\n',
+          '<?php\n$x = ;\n',
+          '<?php\nif ($x) {\n',
+          '<html><?php echo "a" ?></html>\n'],
+}
+INTERPRETERS = {ruby: 'ruby', php: 'php'}
+
+
+def differences(module, source):
+    '''descriptions of what the two ways of checking source disagree on'''
+    code = source.decode('utf-8')
+    one_shot = module.analyze(code, 'parity', {})[1:]
+    resident = module.analyze(code, 'parity',
+                              {'sublimelint_resident_workers': True})[1:]
+    if one_shot == resident:
+        return []
+    return ['%s %r:\n    one-shot: %r\n    resident: %r' % (module.language,
+                                            source, one_shot, resident)]
+
+
+def main():
+    '''entry point of the command'''
+    found = []
+    for module in sorted(SAMPLES, key=lambda module: module.language):
+        if not find_executable(INTERPRETERS[module]):
+            print '%s: skipped, %s is not installed' % (module.language,
+                                                    INTERPRETERS[module])
+            continue
+        for source in SAMPLES[module]:
+            found.extend(differences(module, source))
+        print '%s: %d samples checked' % (module.language,
+                                          len(SAMPLES[module]))
+    for difference in found:
+        print >> sys.stderr, 'difference: %s' % difference
+    return int(bool(found))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+'''Minimal stand-in for the sublime module, so that the plugin and the
+linters can be imported and benchmarked outside of Sublime Text.
+
+Only what the plugin uses is provided; callbacks given to set_timeout
+are queued and only run by run_timeouts().
+'''
+
+DRAW_EMPTY_AS_OVERWRITE = 1
+DRAW_OUTLINED = 2
+
+_TIMEOUTS = []
+
+
+class Region(object):
+    '''region between two points of a buffer'''
+    __slots__ = ('a', 'b')
+
+    def __init__(self, a, b=None):
+        if b is None:
+            b = a
+        self.a = a
+        self.b = b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return abs(self.b - self.a)
+
+    def empty(self):
+        return self.a == self.b
+
+    def __repr__(self):
+        return '(%d, %d)' % (self.a, self.b)
+
+
+def set_timeout(callback, delay):
+    '''queues callback; see run_timeouts()'''
+    _TIMEOUTS.append(callback)
+
+
+def run_timeouts():
+    '''runs the callbacks queued by set_timeout'''
+    while _TIMEOUTS:
+        _TIMEOUTS.pop(0)()
+
+
+def status_message(message):
+    pass
+
+
+def active_window():
+    return None
+
+
+def windows():
+    return []
@@ -0,0 +1,15 @@
+'''Minimal stand-in for the sublime_plugin module; see sublime.py'''
+
+
+class TextCommand(object):
+    def __init__(self, view):
+        self.view = view
+
+
+class WindowCommand(object):
+    def __init__(self, window):
+        self.window = window
+
+
+class EventListener(object):
+    pass
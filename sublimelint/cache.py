@@ -0,0 +1,165 @@
+'''Cache of linter results, keyed by the content that was analyzed.
+
+Linting a buffer whose text is byte-identical to one already analyzed
+(undo/redo, saving right after a modification, reopening a file...)
+returns the previous results instead of running the linter again.
+
+Entries are evicted in least recently used order once either the number
+of entries or their estimated total size exceeds its limit.
+'''
+import cPickle
+import hashlib
+import os
+import sys
+import threading
+
+
+def module_version(module):
+    '''version of a linter module: its declared version, if any, along
+       with the modification time of its source so that results are not
+       reused after the module has been edited'''
+    try:
+        mtime = os.path.getmtime(module.__file__.rstrip('co'))
+    except (AttributeError, OSError):
+        mtime = None
+    return getattr(module, 'version', None), mtime
+
+
+def make_key(module, text, filename, options):
+    '''key identifying the results of a linter run'''
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return (module.__name__, module_version(module),
+            repr(sorted((options or {}).items())), filename,
+            hashlib.sha1(text).hexdigest())
+
+
+def estimate_size(value):
+    '''rough estimate of the memory used by a linter result'''
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.iteritems():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class ResultCache(object):
+    '''least recently used cache, bounded by number of entries and bytes'''
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        '''removes all entries and resets the counters'''
+        self.lock.acquire()
+        try:
+            # circular doubly linked list of [previous, next, key, value, size]
+            # entries; the root's successor is the least recently used one
+            self.root = root = []
+            root[:] = [root, root, None, None, 0]
+            self.entries = {}
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+        finally:
+            self.lock.release()
+
+    def get(self, key):
+        '''returns the value cached for key, or None'''
+        self.lock.acquire()
+        try:
+            link = self.entries.get(key)
+            if link is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._unlink(link)
+            self._append(link)
+            return link[3]
+        finally:
+            self.lock.release()
+
+    def put(self, key, value):
+        '''stores a value, evicting the least recently used entries if
+           the cache is full'''
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        self.lock.acquire()
+        try:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self._unlink(old)
+                self.bytes -= old[4]
+            link = [None, None, key, value, size]
+            self.entries[key] = link
+            self._append(link)
+            self.bytes += size
+            while (len(self.entries) > self.max_entries or
+                                            self.bytes > self.max_bytes):
+                oldest = self.root[1]
+                self._unlink(oldest)
+                del self.entries[oldest[2]]
+                self.bytes -= oldest[4]
+                self.evictions += 1
+        finally:
+            self.lock.release()
+
+    def items(self):
+        '''returns the (key, value) entries, least recently used first'''
+        self.lock.acquire()
+        try:
+            items = []
+            link = self.root[1]
+            while link is not self.root:
+                items.append((link[2], link[3]))
+                link = link[1]
+            return items
+        finally:
+            self.lock.release()
+
+    def save(self, path):
+        '''writes all entries to a file, least recently used first'''
+        items = self.items()
+        output = open(path, 'wb')
+        try:
+            cPickle.dump(items, output, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            output.close()
+
+    def load(self, path):
+        '''adds the entries previously saved to a file'''
+        input = open(path, 'rb')
+        try:
+            items = cPickle.load(input)
+        finally:
+            input.close()
+        for key, value in items:
+            self.put(key, value)
+
+    def stats(self):
+        '''returns the cache counters as a dict'''
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'bytes': self.bytes,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': lookups and float(self.hits) / lookups or 0.0}
+
+    def _append(self, link):
+        last = self.root[0]
+        link[0], link[1] = last, self.root
+        last[1] = self.root[0] = link
+
+    def _unlink(self, link):
+        link[0][1], link[1][0] = link[1], link[0]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return ('<ResultCache %(entries)d entries, %(bytes)d bytes, '
+                '%(hits)d hits, %(misses)d misses>' % self.stats())
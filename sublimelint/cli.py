@@ -0,0 +1,270 @@
+'''Runs the sublimelint linters on whole directory trees, without an editor:
+
+    python -m sublimelint.cli [options] path...
+
+Files are dispatched to a pool of processes (one per CPU by default) and
+the results are written as soon as they are available, one JSON object
+per line for each file and linter:
+
+    {"path": ..., "linter": "Python", "cached": false,
+     "errors": [{"line": 3, "message": ...}, ...],
+     "underlines": [{"line": 3, "start": 4, "end": 9}, ...]}
+
+    {"path": ..., "linter": "annotations", "cached": false,
+     "annotations": [{"line": 1, "column": 2, "text": "TODO"}, ...]}
+
+Line numbers are 1-based; columns are 0-based character offsets.  The
+exit status is 1 if any linter reported an error (annotations do not
+count), which makes the command usable in pre-commit hooks and CI.
+
+Results are cached by content like in the editor; with --cache, the
+cache is saved to a file so that unchanged files are not linted again
+by the next run.  Each file is only read (and hashed) once, by the
+worker process linting it, which skips the linters whose results are
+already cached.
+'''
+import json
+import multiprocessing
+import optparse
+import os
+import sys
+import threading
+
+from sublimelint.cache import ResultCache, make_key
+from sublimelint.lineindex import LineIndex
+
+LINTERS = {'.py': ['python'],
+           '.php': ['php'],
+           '.rb': ['ruby']}
+SKIPPED_DIRECTORIES = ['.git', '.hg', '.svn', '.bzr', 'CVS', '__pycache__']
+
+_CACHED = frozenset()   # keys of the records cached by the parent process
+
+
+def load_linter(name):
+    '''imports a linter module from sublimelint.modules'''
+    fullmod = 'sublimelint.modules.%s' % name
+    __import__(fullmod)
+    return sys.modules[fullmod]
+
+
+def linter_options(linter, settings):
+    '''picks the settings a linter module asks for, like the plugin does
+       with the view settings'''
+    return dict((name, settings.get(name))
+                        for name in getattr(linter, 'settings', ()))
+
+
+def read_text(path):
+    '''reads a file, decoding it as UTF-8 if possible'''
+    source = open(path, 'rb')
+    try:
+        data = source.read()
+    finally:
+        source.close()
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
+
+
+def find_files(paths, skipped=SKIPPED_DIRECTORIES):
+    '''yields the files found in paths, walking directories recursively'''
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if d not in skipped)
+            for filename in sorted(filenames):
+                yield os.path.join(dirpath, filename)
+
+
+def make_record(path, linter, result, text, cached=False):
+    '''converts the results of a linter into a JSON serializable dict'''
+    record = {'path': path, 'linter': linter.language, 'cached': cached}
+    if linter.language == 'annotations':
+        index = LineIndex(text)
+        annotations = []
+        for start, end in result:
+            lineno, column = index.rowcol(start)
+            annotations.append({'line': lineno + 1, 'column': column,
+                                'text': text[start:end]})
+        record['annotations'] = annotations
+        return record
+
+    underlines, lines, error_messages = result
+    errors = []
+    for lineno in sorted(error_messages):
+        for message in error_messages[lineno]:
+            errors.append({'line': lineno + 1, 'message': message})
+    record['errors'] = errors
+    record['underlines'] = []
+    if underlines:
+        spans = underlines.by_line()
+        for lineno in sorted(spans):
+            for start, end in spans[lineno]:
+                record['underlines'].append({'line': lineno + 1,
+                                             'start': start, 'end': end})
+    return record
+
+
+def init_worker(cached):
+    '''sets the keys of the records cached by the parent process; called
+       when a worker process starts'''
+    global _CACHED
+    _CACHED = cached
+
+
+def lint_file(job):
+    '''runs the linters on a file, except those whose record is cached
+       (returned without a record); called in a worker process'''
+    path, names, settings = job
+    try:
+        text = read_text(path)
+    except (IOError, OSError), excp:
+        return path, [(name, None, {'path': path, 'linter': name,
+                                    'failure': str(excp)}) for name in names]
+    results = []
+    for name in names:
+        linter = load_linter(name)
+        options = linter_options(linter, settings)
+        key = make_key(linter, text, path, options)
+        if key in _CACHED:
+            results.append((name, key, None))
+            continue
+        try:
+            result = linter.analyze(text, path, options)
+        except Exception, excp:
+            results.append((name, None, {'path': path,
+                            'linter': linter.language,
+                            'failure': '%s: %s' % (excp.__class__.__name__,
+                                                                    excp)}))
+            continue
+        results.append((name, key, make_record(path, linter, result, text)))
+    return path, results
+
+
+class BatchLinter(object):
+    '''lints files with a process pool, reusing cached results; the cache
+       holds the records written for each file and linter'''
+    def __init__(self, settings, use_pylint=False, use_notes=True,
+                                                    cache=None, output=None):
+        self.settings = settings
+        self.use_pylint = use_pylint
+        self.use_notes = use_notes
+        self.cache = cache or ResultCache(max_entries=100000,
+                                          max_bytes=512 * 1024 * 1024)
+        self.output = output or sys.stdout
+        self.output_lock = threading.Lock()
+        self.found_errors = False
+        self.cached = {}    # key -> record, cached when the run started
+
+    def linters_for(self, path):
+        '''names of the linter modules to run on a file'''
+        extension = os.path.splitext(path)[1].lower()
+        names = list(LINTERS.get(extension, ()))
+        if not names:
+            return names
+        if self.use_pylint and extension == '.py':
+            names.append('sublime_pylint')
+        if self.use_notes:
+            names.append('notes')
+        return names
+
+    def emit(self, record):
+        '''writes a record as a line of JSON'''
+        if record.get('errors') or record.get('failure'):
+            self.found_errors = True
+        line = json.dumps(record, sort_keys=True)
+        self.output_lock.acquire()
+        try:
+            self.output.write(line + '\n')
+            self.output.flush()
+        finally:
+            self.output_lock.release()
+
+    def jobs(self, paths):
+        '''yields the files to lint, with the linters to run on them'''
+        for path in find_files(paths):
+            names = self.linters_for(path)
+            if names:
+                yield path, names, self.settings
+
+    def run(self, paths, processes=None):
+        '''lints all the files found in paths'''
+        # caches saved by older versions hold linter results, not records
+        self.cached = dict((key, value) for key, value in self.cache.items()
+                                                if isinstance(value, dict))
+        cached = frozenset(self.cached)
+        if processes == 1:
+            init_worker(cached)
+            completed = (lint_file(job) for job in self.jobs(paths))
+            self.collect(completed)
+            return
+        pool = multiprocessing.Pool(processes, init_worker, (cached,))
+        try:
+            self.collect(pool.imap_unordered(lint_file, self.jobs(paths), 4))
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    def collect(self, completed):
+        '''writes the records coming from the workers and caches them'''
+        for path, results in completed:
+            for name, key, record in results:
+                if record is None:
+                    record = self.cached[key]
+                    self.cache.get(key)     # most recently used
+                    self.emit(dict(record, cached=True))
+                    continue
+                if key is not None:
+                    self.cache.put(key, record)
+                self.emit(record)
+
+
+def main(argv=None):
+    '''entry point of the command'''
+    parser = optparse.OptionParser(usage='%prog [options] path...')
+    parser.add_option('-j', '--jobs', type='int', default=None,
+                      help='number of processes (default: number of CPUs)')
+    parser.add_option('--cache', metavar='FILE',
+                      help='file in which results are kept between runs')
+    parser.add_option('--pylint', action='store_true', default=False,
+                      help='also run pylint on Python files')
+    parser.add_option('--no-notes', dest='notes', action='store_false',
+                      default=True, help='do not look for annotations')
+    parser.add_option('--annotations', metavar='WORDS',
+                      help='comma separated annotations (default: TODO,README)')
+    parser.add_option('--resident-workers', action='store_true',
+                      default=False,
+                      help='check Ruby/PHP code with resident helper processes')
+    options, paths = parser.parse_args(argv)
+    if not paths:
+        parser.error('no path given')
+
+    settings = {'sublimelint_resident_workers': options.resident_workers}
+    if options.annotations:
+        settings['annotations'] = [word for word in
+                                   options.annotations.split(',') if word]
+
+    batch = BatchLinter(settings, options.pylint, options.notes)
+    if options.cache and os.path.exists(options.cache):
+        try:
+            batch.cache.load(options.cache)
+        except Exception, excp:
+            print >> sys.stderr, 'ignoring unreadable cache %s: %s' % (
+                                                        options.cache, excp)
+    try:
+        batch.run(paths, options.jobs)
+    finally:
+        if options.cache:
+            batch.cache.save(options.cache)
+    return int(batch.found_errors)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+'''Resident helper processes for linters relying on an external interpreter.
+
+Starting "ruby -wc" or "php -l" for every check means paying for the
+interpreter startup each time, which dominates the lint time of small
+files.  A resident worker is a long-lived helper script (see the helpers
+directory) which reads framed requests on its standard input:
+
+    check <length>\\n<source>     answered by   result <length>\\n<report>
+    ping\\n                       answered by   pong\\n
+
+The report is formatted like the output of the equivalent one-shot
+command, so that linters parse both the same way.  When a helper cannot
+be started, stops answering or times out, it is killed and check()
+returns None so that the caller can fall back on a one-shot process; it
+is restarted on a later request, after a delay which grows with the
+number of consecutive failures.
+'''
+import os
+import subprocess
+import threading
+import time
+
+from sublimelint.processes import startupinfo
+
+HELPERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'helpers')
+
+_WORKERS = {}   # name -> ResidentWorker, shared across linter module reloads
+_WORKERS_LOCK = threading.Lock()
+
+
+def helper_path(name):
+    '''absolute path of a helper script'''
+    return os.path.join(HELPERS, name)
+
+
+def resident_worker(name, args):
+    '''returns the resident worker started with args, creating it if needed'''
+    _WORKERS_LOCK.acquire()
+    try:
+        worker = _WORKERS.get(name)
+        if worker is None or worker.args != tuple(args):
+            if worker is not None:
+                worker.stop()
+            worker = _WORKERS[name] = ResidentWorker(args)
+        return worker
+    finally:
+        _WORKERS_LOCK.release()
+
+
+class DaemonError(Exception):
+    '''the helper process did not answer as expected'''
+
+
+class ResidentWorker(object):
+    '''a long-lived helper process answering syntax check requests'''
+    health_interval = 60    # seconds of inactivity after which it is pinged
+    max_backoff = 300       # longest delay (in seconds) before a restart
+
+    def __init__(self, args):
+        self.args = tuple(args)
+        self.lock = threading.Lock()
+        self.process = None
+        self.last_used = 0
+        self.failures = 0
+        self.retry_at = 0
+
+    def check(self, source, timeout):
+        '''returns the helper's report on source, or None if the helper is
+           not available'''
+        if isinstance(source, unicode):
+            source = source.encode('utf-8')
+        self.lock.acquire()
+        try:
+            if time.time() < self.retry_at:
+                return None
+            try:
+                self._ensure_running(timeout)
+                report = self._request('check %d\n' % len(source), source,
+                                                        'result', timeout)
+            except DaemonError, excp:
+                self._failed(excp)
+                return None
+            self.failures = 0
+            return report
+        finally:
+            self.lock.release()
+
+    def stop(self):
+        '''kills the helper process, if any'''
+        process, self.process = self.process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+                process.kill()
+                process.wait()
+            except (IOError, OSError):
+                pass
+
+    def _ensure_running(self, timeout):
+        '''starts the helper unless it is running and healthy'''
+        if self.process is not None and self.process.poll() is None:
+            if time.time() - self.last_used < self.health_interval:
+                return
+            try:
+                self._request('ping\n', '', 'pong', timeout)
+                return
+            except DaemonError:
+                self.stop()
+
+        try:
+            self.process = subprocess.Popen(self.args,
+                                            stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE,
+                                            stderr=open(os.devnull, 'w'),
+                                            startupinfo=startupinfo())
+        except OSError, excp:
+            raise DaemonError(str(excp))
+        self._request('ping\n', '', 'pong', timeout)
+
+    def _request(self, header, body, expected, timeout):
+        '''sends a request and returns the body of the reply'''
+        process = self.process
+        timer = threading.Timer(timeout, self._kill, (process,))
+        timer.start()
+        try:
+            try:
+                process.stdin.write(header)
+                process.stdin.write(body)
+                process.stdin.flush()
+                reply = process.stdout.readline().split()
+                if not reply or reply[0] != expected:
+                    raise DaemonError('unexpected reply %r' % reply)
+                data = ''
+                if len(reply) > 1:
+                    length = int(reply[1])
+                    data = process.stdout.read(length)
+                    if len(data) != length:
+                        raise DaemonError('truncated reply')
+            except (IOError, OSError, ValueError), excp:
+                raise DaemonError(str(excp))
+        finally:
+            timer.cancel()
+        self.last_used = time.time()
+        return data
+
+    def _kill(self, process):
+        try:
+            process.kill()
+        except OSError:
+            pass    # already finished
+
+    def _failed(self, excp):
+        self.stop()
+        self.failures += 1
+        self.retry_at = time.time() + min(self.max_backoff, 2 ** self.failures)
+        print 'SublimeLint: %s helper unavailable (%s)' % (self.args[0], excp)
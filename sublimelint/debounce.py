@@ -0,0 +1,70 @@
+'''Delays of the linter runs, adapted to what the linters cost.
+
+The time a linter takes grows with the size of the buffer it analyzes,
+at a rate which depends on the linter and on the code.  An exponentially
+weighted moving average of that rate (seconds per character) is kept for
+every linter on every view, as well as over all views for the views a
+linter has not run on yet.  A view is then left alone for a time
+proportional to what the next runs are expected to cost before they
+start: cheap linters on small files run right away, while expensive ones
+on large files wait for the user to stop typing instead of keeping the
+processor busy.
+'''
+import threading
+
+
+class CostModel(object):
+    '''expected running time of the linters, safe to use from any
+       thread'''
+    def __init__(self, weight=0.3):
+        '''weight is that of the latest run in the moving averages'''
+        self.weight = weight
+        self.lock = threading.Lock()
+        self.rates = {}     # (view id, language) or language -> seconds
+                            # per character
+
+    def record(self, vid, language, size, seconds):
+        '''adds the time a linter took to analyze size characters'''
+        rate = seconds / max(size, 1)
+        self.lock.acquire()
+        try:
+            for key in (vid, language), language:
+                previous = self.rates.get(key)
+                if previous is None:
+                    self.rates[key] = rate
+                else:
+                    self.rates[key] = (self.weight * rate +
+                                       (1 - self.weight) * previous)
+        finally:
+            self.lock.release()
+
+    def estimate(self, vid, language, size):
+        '''expected time (in seconds) of a linter run on size characters
+           of a view'''
+        self.lock.acquire()
+        try:
+            rate = self.rates.get((vid, language))
+            if rate is None:
+                rate = self.rates.get(language, 0.0)
+        finally:
+            self.lock.release()
+        return rate * size
+
+    def delay(self, vid, languages, size, minimum=0.0, factor=2.0,
+                                                            maximum=5.0):
+        '''time (in seconds) a view of size characters should be left
+           alone before running linters on it: factor times their expected
+           cost, between minimum and maximum'''
+        cost = sum([self.estimate(vid, language, size)
+                                                for language in languages])
+        return max(minimum, min(factor * cost, maximum))
+
+    def forget(self, vid):
+        '''drops the averages of a (closed) view'''
+        self.lock.acquire()
+        try:
+            for key in self.rates.keys():
+                if isinstance(key, tuple) and key[0] == vid:
+                    del self.rates[key]
+        finally:
+            self.lock.release()
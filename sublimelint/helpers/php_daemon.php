@@ -0,0 +1,37 @@
+<?php
+// php_daemon.php - resident syntax checker used by sublimelint
+//
+// Reads "check <length>" requests followed by the source to check on its
+// standard input, and answers with "result <length>" followed by a report
+// formatted like the output of "php -l".  Requires PHP 7 or later, for
+// ParseError.  See sublimelint/daemons.py
+
+function check($source)
+{
+    try {
+        token_get_all($source, TOKEN_PARSE);
+        return "No syntax errors detected in -\n";
+    } catch (ParseError $e) {
+        return 'Parse error: ' . $e->getMessage() . ' in - on line ' .
+               $e->getLine() . "\n";
+    }
+}
+
+while (($header = fgets(STDIN)) !== false) {
+    $request = explode(' ', trim($header));
+    if ($request[0] === 'ping') {
+        fwrite(STDOUT, "pong\n");
+        fflush(STDOUT);
+    } elseif ($request[0] === 'check') {
+        $length = (int) $request[1];
+        $source = '';
+        while (strlen($source) < $length && !feof(STDIN)) {
+            $source .= fread(STDIN, $length - strlen($source));
+        }
+        $report = check($source);
+        fwrite(STDOUT, 'result ' . strlen($report) . "\n" . $report);
+        fflush(STDOUT);
+    } else {
+        break;
+    }
+}
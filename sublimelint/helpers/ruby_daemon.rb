@@ -0,0 +1,53 @@
+# ruby_daemon.rb - resident syntax checker used by sublimelint
+#
+# Reads "check <length>" requests followed by the source to check on its
+# standard input, and answers with "result <length>" followed by the same
+# report "ruby -wc" would give.  See sublimelint/daemons.py
+#
+# The source is compiled from a file rather than from a string: code
+# compiled from a string is parsed like code given to eval, which does not
+# warn about the unused variables of the top level and of blocks.
+
+require 'stringio'
+require 'tempfile'
+
+$stdin.binmode
+$stdout.binmode
+$stdout.sync = true
+
+SOURCE = Tempfile.new(['sublimelint', '.rb'])
+SOURCE.close
+
+def check(source)
+  File.open(SOURCE.path, 'wb') { |file| file.write(source) }
+  captured = StringIO.new
+  stderr, $stderr = $stderr, captured
+  verbose, $VERBOSE = $VERBOSE, true
+  begin
+    RubyVM::InstructionSequence.compile_file(SOURCE.path)
+    report = captured.string + "Syntax OK\n"
+  rescue SyntaxError => e
+    report = captured.string + e.message + "\n"
+  ensure
+    $stderr = stderr
+    $VERBOSE = verbose
+  end
+  # the code is reported as coming from the standard input, like ruby -wc -
+  report.gsub(SOURCE.path, '-')
+end
+
+while (header = $stdin.gets)
+  command, length = header.split
+  case command
+  when 'ping'
+    $stdout.write("pong\n")
+  when 'check'
+    source = $stdin.read(length.to_i) || ''
+    source.force_encoding('UTF-8')
+    report = check(source).b
+    $stdout.write("result #{report.bytesize}\n")
+    $stdout.write(report)
+  else
+    break
+  end
+end
@@ -0,0 +1,85 @@
+'''Index of the line start offsets of a text snapshot.
+
+Converting line/column positions into absolute points (and back) used
+to require a call into the editor API for each conversion; the index is
+built once per snapshot and answers the same questions from the text
+alone, so it can be used from any thread.
+'''
+from array import array
+from bisect import bisect_right
+import threading
+
+_RECENT = []    # most recently used indexes, newest last
+_RECENT_SIZE = 4
+_LOCK = threading.Lock()
+
+
+def index_for(text):
+    '''returns the index of a text snapshot, reusing the one already built
+       for that very same string by another linter or by the plugin'''
+    _LOCK.acquire()
+    try:
+        for index in _RECENT:
+            if index.text is text:
+                return index
+    finally:
+        _LOCK.release()
+    index = LineIndex(text)
+    _LOCK.acquire()
+    try:
+        _RECENT.append(index)
+        del _RECENT[:-_RECENT_SIZE]
+    finally:
+        _LOCK.release()
+    return index
+
+
+class LineIndex(object):
+    '''offsets of the beginning of each line of a text'''
+    def __init__(self, text):
+        self.text = text
+        starts = array('l', [0])
+        find = text.find
+        position = find('\n')
+        while position != -1:
+            starts.append(position + 1)
+            position = find('\n', position + 1)
+        self.starts = starts
+
+    def __len__(self):
+        '''number of lines in the text'''
+        return len(self.starts)
+
+    def line_start(self, lineno):
+        '''offset of the first character of a line; like view.text_point,
+           line numbers past the end of the text refer to the last line'''
+        if lineno >= len(self.starts):
+            lineno = len(self.starts) - 1
+        return self.starts[lineno]
+
+    def line_end(self, lineno):
+        '''offset of the end of a line, excluding its newline'''
+        if lineno + 1 < len(self.starts):
+            return self.starts[lineno + 1] - 1
+        return len(self.text)
+
+    def point(self, lineno, column):
+        '''absolute offset of a line/column position'''
+        return min(self.line_start(lineno) + column, len(self.text))
+
+    def full_line(self, lineno):
+        '''(start, end) of a line, including its newline'''
+        if lineno + 1 < len(self.starts):
+            return self.starts[lineno], self.starts[lineno + 1]
+        return self.line_start(lineno), len(self.text)
+
+    def line(self, lineno):
+        '''text of a line, without its newline'''
+        if lineno >= len(self.starts):
+            return ''
+        return self.text[self.starts[lineno]:self.line_end(lineno)]
+
+    def rowcol(self, point):
+        '''(line number, column) of an absolute offset'''
+        lineno = bisect_right(self.starts, point) - 1
+        return lineno, point - self.starts[lineno]
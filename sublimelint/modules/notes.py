@@ -3,12 +3,27 @@
 Used to highlight user-defined "annotations" such as TODO, README, etc., 
 depending user choice.
 
+All the annotations are looked for in a single pass over the text, with
+a regular expression compiled once for each set of annotations.  When
+there are only a few of them, str.find is used instead, as it is faster;
+so it is when an occurence of one annotation may overlap one of another
+(such as TOD and ODO in TODO), which a regular expression would skip.
+
+In the editor, the matches found in each view are kept by an Incremental
+object: when the view is modified, only the lines which changed since
+the previous scan are looked at again.
+
 '''
-import sublime
+import bisect
+import re
+import threading
 
+from sublimelint.lineindex import LineIndex
 
 default_notes = ["TODO", "README"]
 language = "annotations"
+settings = ("annotations",)    # view settings passed on to analyze()
+tier = "keystroke"  # cheap enough to run on every modification
 description =\
 '''* view.run_command("lint", "annotations")
         Turns background linter off and highlight user notes.
@@ -18,14 +33,138 @@ description =\
         my_notes = %s
 ''' % default_notes
 
-def run(code, view):
-    '''linter method called by default'''
-    annotations = select_(view)
-    
-    regions = []
-    for note in annotations:
-        regions.extend(find_all(code, note, view))
-    return regions
+_PATTERNS = {}  # tuple of annotations -> see annotation_pattern()
+_PATTERNS_SIZE = 16
+UNICODE_SIZE = len(buffer(u'a'))
+_FIND_LIMIT = 3     # number of annotations up to which str.find is used
+
+def analyze(code, filename='untitled', options=None):
+    '''linter method called by default; returns the (start, end)
+       positions of all annotations found in the code'''
+    return find_annotations(code, selected(options))
+
+def selected(options):
+    '''the annotations to look for, given the linter options'''
+    annotations = None
+    if options:
+        annotations = options.get("annotations")
+    if annotations is None:
+        annotations = default_notes
+    return annotations
+
+
+class Incremental(object):
+    '''analyze() keeping the matches of its previous call: only the lines
+       which differ from the previous text are scanned again, the matches
+       after them being moved'''
+    # below this size, finding what changed costs as much as a new scan
+    minimum_size = 4096
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.annotations = None
+        self.text = None
+        self.found = []
+
+    def analyze(self, code, filename='untitled', options=None):
+        '''same as the module level analyze()'''
+        annotations = tuple(selected(options))
+        self.lock.acquire()
+        try:
+            if (annotations != self.annotations or self.text is None or
+                    len(code) < self.minimum_size or
+                    [note for note in annotations if '\n' in note]):
+                found = find_annotations(code, annotations)
+            else:
+                found = self.rescan(code, annotations)
+            self.annotations, self.text, self.found = annotations, code, found
+            return found
+        finally:
+            self.lock.release()
+
+    def rescan(self, code, annotations):
+        '''updates the matches found in the previous text'''
+        old = self.text
+        start = common_prefix(old, code)
+        if start == len(old) == len(code):
+            return self.found
+        end = len(code) - common_suffix(old, code, start)
+        # rescan the whole lines in which the change took place
+        start = code.rfind('\n', 0, start) + 1
+        end = code.find('\n', end)
+        if end == -1:
+            end = len(code)
+        shift = len(code) - len(old)
+        old_end = end - shift
+
+        found = self.found
+        first = bisect.bisect_left(found, (start, -1))
+        last = bisect.bisect_left(found, (old_end, -1), first)
+        rescanned = [(begin + start, stop + start) for begin, stop in
+                        find_annotations(code[start:end], annotations)]
+        if shift:
+            moved = [(begin + shift, stop + shift)
+                                            for begin, stop in found[last:]]
+        else:
+            moved = found[last:]
+        return found[:first] + rescanned + moved
+
+
+def common_prefix(first, second, block=4096):
+    '''length of the longest common prefix of two strings'''
+    length = min(len(first), len(second))
+    position = 0
+    if type(first) is type(second):
+        # skip identical blocks, compared in place, then bisect inside
+        # the one that differs
+        size = item_size(first)
+        while (position + block <= length and
+                buffer(first, position * size, block * size) ==
+                buffer(second, position * size, block * size)):
+            position += block
+    low, high = position, min(position + block, length)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[position:middle] == second[position:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    if low == position + block:     # strings of different types
+        return common_prefix(first[low:], second[low:], block) + low
+    return low
+
+def common_suffix(first, second, limit, block=4096):
+    '''length of the longest common suffix of two strings which does not
+       reach into their first "limit" characters'''
+    length = min(len(first), len(second)) - limit
+    first_end, second_end = len(first), len(second)
+    suffix = 0
+    if type(first) is type(second):
+        size = item_size(first)
+        while (suffix + block <= length and
+                buffer(first, (first_end - suffix - block) * size,
+                                                        block * size) ==
+                buffer(second, (second_end - suffix - block) * size,
+                                                        block * size)):
+            suffix += block
+    low, high = suffix, min(suffix + block, length)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if (first[first_end - middle:first_end - suffix] ==
+                            second[second_end - middle:second_end - suffix]):
+            low = middle
+        else:
+            high = middle - 1
+    if low == suffix + block:       # strings of different types
+        return common_suffix(first[:first_end - low],
+                             second[:second_end - low], limit, block) + low
+    return low
+
+def item_size(text):
+    '''number of bytes used by each character of a string'''
+    if isinstance(text, unicode):
+        return UNICODE_SIZE
+    return 1
 
 def select_(view):
     '''selects the list of annotations to use'''
@@ -37,35 +176,80 @@ def select_(view):
 
 def extract_annotations(code, view, filename):
     '''extract all lines with annotations'''
-    annotations = select_(view)
-    note_starts = []
-    for note in annotations:
-        start = 0
-        length = len(note)
-        while True:
-            start = code.find(note, start)
-            if start != -1:
-                end = start + length
-                note_starts.append(start)
-                start = end
-            else:
-                break
-    regions_with_notes = set([])
-    for point in note_starts:
-        regions_with_notes.add(view.extract_scope(point))
-    regions_with_notes = sorted(list(regions_with_notes))
-    text = []
-    for region in regions_with_notes:
-        row, col = view.rowcol(region.begin())
-        text.append("[[%s:%s]]" % (filename, row+1))
-        text.append(view.substr(region))
-
-    return '\n'.join(text)
-    
-
-def find_all(text, string, view):
+    return ''.join(iter_annotations(code, view, filename))
+
+def iter_annotations(code, view, filename):
+    '''yields the text of extract_annotations() piece by piece, so that
+       it can be shown while the rest is being extracted: the scope (the
+       comment or string) enclosing each annotation, preceded by its
+       location; a scope containing several annotations is extracted and
+       shown only once'''
+    index = LineIndex(code)
+    separator = ''
+    seen = set()
+    begin = end = -1
+    for point, stop in find_annotations(code, select_(view)):
+        if begin <= point < end:
+            continue    # in the same comment or string as the previous one
+        region = view.extract_scope(point)
+        begin, end = region.begin(), region.end()
+        if (begin, end) in seen:
+            continue
+        seen.add((begin, end))
+        row, col = index.rowcol(begin)
+        yield "%s[[%s:%s]]\n%s" % (separator, filename, row + 1,
+                                                            code[begin:end])
+        separator = '\n'
+
+
+def annotation_pattern(annotations):
+    '''returns a pattern matching any of the annotations, and the list of
+       the distinct annotations; the pattern is None if there are none, or
+       if an occurence of one of them may overlap one of another'''
+    key = tuple(annotations)
+    try:
+        return _PATTERNS[key]
+    except KeyError:
+        pass
+    notes = sorted(set([note for note in key if note]), key=len, reverse=True)
+    pattern = None
+    if notes and not [note for note in notes if overlaps(note, notes)]:
+        pattern = re.compile('|'.join([re.escape(note) for note in notes]))
+    if len(_PATTERNS) >= _PATTERNS_SIZE:
+        _PATTERNS.clear()
+    _PATTERNS[key] = pattern, notes
+    return pattern, notes
+
+def overlaps(note, notes):
+    '''True if an occurence of one of the notes could start inside an
+       occurence of note'''
+    for other in notes:
+        for position in range(len(note)):
+            if position == 0 and other == note:
+                continue
+            rest = note[position:]
+            if other.startswith(rest) or rest.startswith(other):
+                return True
+    return False
+
+def find_annotations(text, annotations):
+    '''finds all occurences of any of the annotations in "text" and notes
+       their positions as (start, end) tuples'''
+    pattern, notes = annotation_pattern(annotations)
+    if pattern is not None and len(notes) > _FIND_LIMIT:
+        return [match.span() for match in pattern.finditer(text)]
+    # str.find is so much faster than a regular expression scan that a
+    # pass per annotation is cheaper when there are only a few of them;
+    # it also finds the occurences which overlap those of another one
+    found = []
+    for note in notes:
+        found.extend(find_all(text, note))
+    found.sort()
+    return found
+
+def find_all(text, string):
     ''' finds all occurences of "string" in "text" and notes their positions
-       as a sublime Region
+       as (start, end) tuples
        '''
     found = []
     length = len(string)
@@ -74,7 +258,7 @@ def find_all(text, string, view):
         start = text.find(string, start)
         if start != -1:
             end = start + length
-            found.append( sublime.Region(start, end) )
+            found.append((start, end))
             start = end
         else:
             break
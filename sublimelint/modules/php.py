@@ -1,54 +1,58 @@
-# php.py - sublimelint package for checking php files
-
-import subprocess, os
-
-def check(codeString, filename):
-	info = None
-	if os.name == 'nt':
-		info = subprocess.STARTUPINFO()
-		info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-		info.wShowWindow = subprocess.SW_HIDE
-
-	process = subprocess.Popen(('php', '-l', '-d display_errors=On'), 
-								stdin=subprocess.PIPE, 
-								stdout=subprocess.PIPE, 
-								startupinfo=info)
-	result = process.communicate(codeString)[0]
-
-	return result
-
-# start sublimelint php plugin
-import re
-__all__ = ['run', 'language']
-language = 'PHP'
-description =\
-'''* view.run_command("lint", "PHP")
-        Turns background linter off and runs the default PHP linter
-        (php - l, assumed to be on $PATH) on current view.
-'''
-
-def run(code, view, filename='untitled'):
-	errors = check(code, filename)
-	
-	lines = set()
-	underline = [] # leave this here for compatibility with original plugin
-	
-	errorMessages = {}
-	def addMessage(lineno, message):
-		message = str(message)
-		if lineno in errorMessages:
-			errorMessages[lineno].append(message)
-		else:
-			errorMessages[lineno] = [message]
-	
-	for line in errors.splitlines():
-		match = re.match(r'^Parse error:\s*syntax error,\s*(?P<error>.+?)\s+in\s+.+?\s*line\s+(?P<line>\d+)', line)
-
-		if match:
-			error, line = match.group('error'), match.group('line')
-
-			lineno = int(line) - 1
-			lines.add(lineno)
-			addMessage(lineno, error)
-
-	return underline, lines, errorMessages
+# php.py - sublimelint package for checking php files
+
+from sublimelint.daemons import helper_path, resident_worker
+from sublimelint.processes import RUNNER
+
+timeout = 10	# seconds after which php is killed
+
+def check(codeString, filename, resident=False):
+	if resident:
+		daemon = resident_worker('php', ('php', helper_path('php_daemon.php')))
+		result = daemon.check(codeString, timeout)
+		if result is not None:
+			return result
+	return RUNNER.communicate(('php', '-l', '-d display_errors=On'),
+								codeString, timeout)
+
+# start sublimelint php plugin
+import re
+__all__ = ['analyze', 'language']
+language = 'PHP'
+settings = ('sublimelint_resident_workers',)
+tier = 'idle'	# see the TIERS of the plugin
+description =\
+'''* view.run_command("lint", "PHP")
+        Turns background linter off and runs the default PHP linter
+        (php - l, assumed to be on $PATH) on current view.
+
+        If the user preference "sublimelint_resident_workers" is true, a
+        php process (version 7 or later) is kept running in the background
+        to check the code instead of starting a new one for every check.
+'''
+
+def analyze(code, filename='untitled', options=None):
+	resident = options and options.get('sublimelint_resident_workers')
+	errors = check(code, filename, resident)
+	
+	lines = set()
+	underline = [] # leave this here for compatibility with original plugin
+	
+	errorMessages = {}
+	def addMessage(lineno, message):
+		message = str(message)
+		if lineno in errorMessages:
+			errorMessages[lineno].append(message)
+		else:
+			errorMessages[lineno] = [message]
+	
+	for line in errors.splitlines():
+		match = re.match(r'^Parse error:\s*syntax error,\s*(?P<error>.+?)\s+in\s+.+?\s*line\s+(?P<line>\d+)', line)
+
+		if match:
+			error, line = match.group('error'), match.group('line')
+
+			lineno = int(line) - 1
+			lines.add(lineno)
+			addMessage(lineno, error)
+
+	return underline, lines, errorMessages
@@ -36,111 +36,123 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
-# TODO:
-# * fix regex for variable names inside strings (quotes)
-
-import sublime
-
 import __builtin__
+import copy
 import os.path
-import compiler
-from compiler import ast
+import types
+import parser
+from compiler import ast, transformer
 
 class messages:
 	class Message(object):
+		__slots__ = ('filename', 'lineno')
 		message = ''
-		message_args = ()
+		message_fields = ()	# attributes formatted into the message
 		def __init__(self, filename, lineno):
 			self.filename = filename
 			self.lineno = lineno
+		def message_args(self):
+			# built on demand: most messages are only formatted once
+			return tuple([getattr(self, field) for field in self.message_fields])
+		message_args = property(message_args)
 		def __str__(self):
 			return self.message % self.message_args
 
 
 	class UnusedImport(Message):
+		__slots__ = ('name',)
 		message = '%r imported but unused'
+		message_fields = ('name',)
 		def __init__(self, filename, lineno, name):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
-			self.message_args = (name,)
 
 
 	class RedefinedWhileUnused(Message):
+		__slots__ = ('name', 'orig_lineno')
 		message = 'redefinition of unused %r from line %r'
+		message_fields = ('name', 'orig_lineno')
 		def __init__(self, filename, lineno, name, orig_lineno):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
 			self.orig_lineno = orig_lineno
-			self.message_args = (name, orig_lineno)
 
 
 	class ImportShadowedByLoopVar(Message):
+		__slots__ = ('name', 'orig_lineno')
 		message = 'import %r from line %r shadowed by loop variable'
+		message_fields = ('name', 'orig_lineno')
 		def __init__(self, filename, lineno, name, orig_lineno):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
 			self.orig_lineno = orig_lineno
-			self.message_args = (name, orig_lineno)
 
 
 	class ImportStarUsed(Message):
+		__slots__ = ('modname',)
 		message = "'from %s import *' used; unable to detect undefined names"
+		message_fields = ('modname',)
 		def __init__(self, filename, lineno, modname):
 			messages.Message.__init__(self, filename, lineno)
 			self.modname = modname
-			self.message_args = (modname,)
 
 
 	class UndefinedName(Message):
+		__slots__ = ('name',)
 		message = 'undefined name %r'
+		message_fields = ('name',)
 		def __init__(self, filename, lineno, name):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
-			self.message_args = (name,)
 
 
 
 	class UndefinedExport(Message):
+		__slots__ = ('name',)
 		message = 'undefined name %r in __all__'
+		message_fields = ('name',)
 		def __init__(self, filename, lineno, name):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
-			self.message_args = (name,)
 
 
 
 	class UndefinedLocal(Message):
+		__slots__ = ('name', 'orig_lineno')
 		message = "local variable %r (defined in enclosing scope on line %r) referenced before assignment"
+		message_fields = ('name', 'orig_lineno')
 		def __init__(self, filename, lineno, name, orig_lineno):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
 			self.orig_lineno = orig_lineno
-			self.message_args = (name, orig_lineno)
 
 
 	class DuplicateArgument(Message):
+		__slots__ = ('name',)
 		message = 'duplicate argument %r in function definition'
+		message_fields = ('name',)
 		def __init__(self, filename, lineno, name):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
-			self.message_args = (name,)
 
 
 	class RedefinedFunction(Message):
+		__slots__ = ('name', 'orig_lineno')
 		message = 'redefinition of function %r from line %r'
+		message_fields = ('name', 'orig_lineno')
 		def __init__(self, filename, lineno, name, orig_lineno):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
 			self.orig_lineno = orig_lineno
-			self.message_args = (name, orig_lineno)
 
 
 	class LateFutureImport(Message):
+		__slots__ = ('names',)
 		message = 'future import(s) %r after other statements'
+		message_fields = ('names',)
 		def __init__(self, filename, lineno, names):
 			messages.Message.__init__(self, filename, lineno)
 			self.names = names
-			self.message_args = (names,)
 
 
 	class UnusedVariable(Message):
@@ -149,11 +161,12 @@ class messages:
 		used.
 		"""
 
+		__slots__ = ('name',)
 		message = 'local variable %r is assigned to but never used'
+		message_fields = ('name',)
 		def __init__(self, filename, lineno, name):
 			messages.Message.__init__(self, filename, lineno)
 			self.name = name
-			self.message_args = (name,)
 
 class Binding(object):
 	"""
@@ -167,8 +180,13 @@ class Binding(object):
 				line number that this binding was last used
 	"""
 
+	# the checker creates one binding per assignment, argument and import:
+	# no instance dictionaries, and names interned so that every binding
+	# of a name shares the same string
+	__slots__ = ('name', 'source', 'used')
+
 	def __init__(self, name, source):
-		self.name = name
+		self.name = intern(name)
 		self.source = source
 		self.used = False
 
@@ -185,6 +203,7 @@ class Binding(object):
 
 class UnBinding(Binding):
 	'''Created by the 'del' operator.'''
+	__slots__ = ()
 
 
 
@@ -196,8 +215,10 @@ class Importation(Binding):
 		possibly including multiple dotted components.
 	@type fullName: C{str}
 	"""
+	__slots__ = ('fullName',)
+
 	def __init__(self, name, source):
-		self.fullName = name
+		self.fullName = intern(name)
 		name = name.split('.')[0]
 		super(Importation, self).__init__(name, source)
 
@@ -207,6 +228,7 @@ class Argument(Binding):
 	"""
 	Represents binding a name as an argument.
 	"""
+	__slots__ = ()
 
 
 
@@ -218,11 +240,12 @@ class Assignment(Binding):
 	the checker does not consider assignments in tuple/list unpacking to be
 	Assignments, rather it treats them as simple Bindings.
 	"""
+	__slots__ = ()
 
 
 
 class FunctionDefinition(Binding):
-	pass
+	__slots__ = ()
 
 
 
@@ -240,6 +263,8 @@ class ExportBinding(Binding):
 	Names which are imported and not otherwise used but appear in the value of
 	C{__all__} will not have an unused import warning reported for them.
 	"""
+	__slots__ = ()
+
 	def names(self):
 		"""
 		Return a list of the names referenced by this binding.
@@ -254,20 +279,27 @@ class ExportBinding(Binding):
 
 
 class Scope(dict):
-	importStarred = False       # set to True when import * is found
+	"""
+	@ivar parent: The enclosing scope, None for the module scope.  Scopes
+		are never removed from the chain of their parents, so the innermost
+		scope stands for the whole stack of scopes around it.
+	"""
+	__slots__ = ('importStarred', 'parent')
 
 
 	def __repr__(self):
 		return '<%s at 0x%x %s>' % (self.__class__.__name__, id(self), dict.__repr__(self))
 
 
-	def __init__(self):
+	def __init__(self, parent=None):
 		super(Scope, self).__init__()
+		self.importStarred = False	# set to True when import * is found
+		self.parent = parent
 
 
 
 class ClassScope(Scope):
-	pass
+	__slots__ = ()
 
 
 
@@ -277,14 +309,16 @@ class FunctionScope(Scope):
 
 	@ivar globals: Names declared 'global' in this function.
 	"""
-	def __init__(self):
-		super(FunctionScope, self).__init__()
+	__slots__ = ('globals',)
+
+	def __init__(self, parent=None):
+		super(FunctionScope, self).__init__(parent)
 		self.globals = {}
 
 
 
 class ModuleScope(Scope):
-	pass
+	__slots__ = ()
 
 
 # Globally defined names which are not attributes of the __builtin__ module.
@@ -298,23 +332,29 @@ class Checker(object):
 
 	@ivar _deferredFunctions: Tracking list used by L{deferFunction}.  Elements
 		of the list are two-tuples.  The first element is the callable passed
-		to L{deferFunction}.  The second element is a copy of the scope stack
-		at the time L{deferFunction} was called.
+		to L{deferFunction}.  The second element is the innermost scope at the
+		time L{deferFunction} was called, the scope stack being the chain of
+		its parents.
 
 	@ivar _deferredAssignments: Similar to C{_deferredFunctions}, but for
 		callables which are deferred assignment checks.
-	"""
 
-	nodeDepth = 0
-	traceTree = False
+	@ivar _handlers: The handler of each node class, see L{handlers}.
+
+	@ivar _unusedImports: The importations which may still be unused, by
+		name: a list of (scope, importation) pairs for each name, pruned
+		by L{addBinding} as the importations get used or rebound.
+	"""
 
 	def __init__(self, tree, filename='(none)'):
+		self._handlers = self.handlers()
 		self._deferredFunctions = []
 		self._deferredAssignments = []
 		self.dead_scopes = []
 		self.messages = []
 		self.filename = filename
-		self.scopeStack = [ModuleScope()]
+		self._unusedImports = {}
+		self.moduleScope = self.scope = ModuleScope()
 		self.futuresAllowed = True
 		self.handleChildren(tree)
 		self._runDeferred(self._deferredFunctions)
@@ -325,7 +365,7 @@ class Checker(object):
 		# Set _deferredAssignments to None so that deferAssignment will fail
 		# noisly if called after we've run through the deferred assignments.
 		self._deferredAssignments = None
-		del self.scopeStack[1:]
+		self.scope = self.moduleScope
 		self.popScope()
 		self.check_dead_scopes()
 
@@ -339,7 +379,7 @@ class Checker(object):
 		`callable` is called, the scope at the time this is called will be
 		restored, however it will contain any new bindings added to it.
 		'''
-		self._deferredFunctions.append((callable, self.scopeStack[:]))
+		self._deferredFunctions.append((callable, self.scope))
 
 
 	def deferAssignment(self, callable):
@@ -347,7 +387,7 @@ class Checker(object):
 		Schedule an assignment handler to be called just after deferred
 		function handlers.
 		"""
-		self._deferredAssignments.append((callable, self.scopeStack[:]))
+		self._deferredAssignments.append((callable, self.scope))
 
 
 	def _runDeferred(self, deferred):
@@ -355,16 +395,24 @@ class Checker(object):
 		Run the callables in C{deferred} using their associated scope stack.
 		"""
 		for handler, scope in deferred:
-			self.scopeStack = scope
+			self.scope = scope
 			handler()
 
 
-	def scope(self):
-		return self.scopeStack[-1]
-	scope = property(scope)
+	def scopeStack(self):
+		'''the scopes from the module scope to the current one'''
+		stack = []
+		scope = self.scope
+		while scope is not None:
+			stack.append(scope)
+			scope = scope.parent
+		stack.reverse()
+		return stack
+	scopeStack = property(scopeStack)
 
 	def popScope(self):
-		self.dead_scopes.append(self.scopeStack.pop())
+		self.dead_scopes.append(self.scope)
+		self.scope = self.scope.parent
 
 
 	def check_dead_scopes(self):
@@ -373,35 +421,38 @@ class Checker(object):
 		which were imported but unused.
 		"""
 		for scope in self.dead_scopes:
-			export = isinstance(scope.get('__all__'), ExportBinding)
-			if export:
-				all = scope['__all__'].names()
-				if os.path.split(self.filename)[1] != '__init__.py':
-					# Look for possible mistakes in the export list
-					undefined = set(all) - set(scope)
-					for name in undefined:
-						self.report(
-							messages.UndefinedExport,
-							scope['__all__'].source.lineno,
-							name)
-			else:
-				all = []
+			self.checkDeadScope(scope)
+
+	def checkDeadScope(self, scope):
+		export = isinstance(scope.get('__all__'), ExportBinding)
+		if export:
+			all = scope['__all__'].names()
+			if os.path.split(self.filename)[1] != '__init__.py':
+				# Look for possible mistakes in the export list
+				undefined = set(all) - set(scope)
+				for name in undefined:
+					self.report(
+						messages.UndefinedExport,
+						scope['__all__'].source.lineno,
+						name)
+		else:
+			all = []
 
-			# Look for imported names that aren't used.
-			for importation in scope.itervalues():
-				if isinstance(importation, Importation):
-					if not importation.used and importation.name not in all:
-						self.report(
-							messages.UnusedImport,
-							importation.source.lineno,
-							importation.name)
+		# Look for imported names that aren't used.
+		for importation in scope.itervalues():
+			if isinstance(importation, Importation):
+				if not importation.used and importation.name not in all:
+					self.report(
+						messages.UnusedImport,
+						importation.source.lineno,
+						importation.name)
 
 
 	def pushFunctionScope(self):
-		self.scopeStack.append(FunctionScope())
+		self.scope = FunctionScope(self.scope)
 
 	def pushClassScope(self):
-		self.scopeStack.append(ClassScope())
+		self.scope = ClassScope(self.scope)
 
 	def report(self, messageClass, *args, **kwargs):
 		self.messages.append(messageClass(self.filename, *args, **kwargs))
@@ -410,21 +461,37 @@ class Checker(object):
 		for node in tree.getChildNodes():
 			self.handleNode(node, tree)
 
+	def handlers(cls):
+		'''
+		Returns the handler of each node class, the method named after the
+		class in upper case; the table is only built once for each Checker
+		class.
+		'''
+		if '_handlerTable' not in cls.__dict__:
+			table = {}
+			for nodeClass in vars(ast).itervalues():
+				if not (isinstance(nodeClass, types.ClassType) and
+						issubclass(nodeClass, ast.Node)):
+					continue
+				handler = getattr(cls, nodeClass.__name__.upper(), None)
+				if handler is not None:
+					table[nodeClass] = handler.im_func
+			cls._handlerTable = table
+		return cls._handlerTable
+	handlers = classmethod(handlers)
+
 	def handleNode(self, node, parent):
 		node.parent = parent
-		if self.traceTree:
-			print '  ' * self.nodeDepth + node.__class__.__name__
-		self.nodeDepth += 1
-		nodeType = node.__class__.__name__.upper()
-		if nodeType not in ('STMT', 'FROM'):
+		nodeClass = node.__class__
+		if (self.futuresAllowed and nodeClass is not ast.Stmt
+				and nodeClass is not ast.From):
 			self.futuresAllowed = False
 		try:
-			handler = getattr(self, nodeType)
-			handler(node)
-		finally:
-			self.nodeDepth -= 1
-		if self.traceTree:
-			print '  ' * self.nodeDepth + 'end ' + node.__class__.__name__
+			handler = self._handlers[nodeClass]
+		except KeyError:
+			# no handler: fails the way it always did
+			handler = getattr(self, nodeClass.__name__.upper()).im_func
+		handler(self, node)
 
 	def ignore(self, node):
 		pass
@@ -454,16 +521,9 @@ class Checker(object):
 			self.report(messages.RedefinedFunction,
 						lineno, value.name, self.scope[value.name].source.lineno)
 
-		if not isinstance(self.scope, ClassScope):
-			for scope in self.scopeStack[::-1]:
-				existing = scope.get(value.name)
-				if (isinstance(existing, Importation)
-						and not existing.used
-						and (not isinstance(value, Importation) or value.fullName == existing.fullName)
-						and reportRedef):
-
-					self.report(messages.RedefinedWhileUnused,
-								lineno, value.name, scope[value.name].source.lineno)
+		if (reportRedef and not isinstance(self.scope, ClassScope)
+				and value.name in self._unusedImports):
+			self.reportRedefinedImports(lineno, value)
 
 		if isinstance(value, UnBinding):
 			try:
@@ -472,6 +532,33 @@ class Checker(object):
 				self.report(messages.UndefinedName, lineno, value.name)
 		else:
 			self.scope[value.name] = value
+			if isinstance(value, Importation) and not value.used:
+				self._unusedImports.setdefault(value.name, []).append(
+													(self.scope, value))
+
+	def reportRedefinedImports(self, lineno, value):
+		'''
+		Reports the unused importations of the name of `value` which it
+		redefines, from the innermost scope outwards.
+		'''
+		unused = [(scope, existing)
+				  for scope, existing in self._unusedImports[value.name]
+				  if not existing.used and scope.get(value.name) is existing]
+		if not unused:
+			del self._unusedImports[value.name]
+			return
+		self._unusedImports[value.name] = unused
+
+		scope = self.scope
+		while scope is not None:
+			existing = scope.get(value.name)
+			if (isinstance(existing, Importation)
+					and not existing.used
+					and (not isinstance(value, Importation) or value.fullName == existing.fullName)):
+
+				self.report(messages.RedefinedWhileUnused,
+							lineno, value.name, existing.source.lineno)
+			scope = scope.parent
 
 
 	def WITH(self, node):
@@ -542,22 +629,23 @@ class Checker(object):
 
 		# try enclosing function scopes
 
-		for scope in self.scopeStack[-2:0:-1]:
+		scope = self.scope.parent
+		while scope is not None and scope is not self.moduleScope:
 			importStarred = importStarred or scope.importStarred
-			if not isinstance(scope, FunctionScope):
-				continue
-			try:
-				scope[node.name].used = (self.scope, node.lineno)
-			except KeyError:
-				pass
-			else:
-				return
+			if isinstance(scope, FunctionScope):
+				try:
+					scope[node.name].used = (self.scope, node.lineno)
+				except KeyError:
+					pass
+				else:
+					return
+			scope = scope.parent
 
 		# try global scope
 
-		importStarred = importStarred or self.scopeStack[0].importStarred
+		importStarred = importStarred or self.moduleScope.importStarred
 		try:
-			self.scopeStack[0][node.name].used = (self.scope, node.lineno)
+			self.moduleScope[node.name].used = (self.scope, node.lineno)
 		except KeyError:
 			if ((not hasattr(__builtin__, node.name))
 					and node.name not in _MAGIC_GLOBALS
@@ -637,23 +725,27 @@ class Checker(object):
 		else:
 			# if the name hasn't already been defined in the current scope
 			if isinstance(self.scope, FunctionScope) and node.name not in self.scope:
-				# for each function or module scope above us
-				for scope in self.scopeStack[:-1]:
-					if not isinstance(scope, (FunctionScope, ModuleScope)):
-						continue
+				# for each function or module scope above us, the outermost
+				# one being reported
+				mistake = None
+				scope = self.scope.parent
+				while scope is not None:
 					# if the name was defined in that scope, and the name has
 					# been accessed already in the current scope, and hasn't
 					# been declared global
-					if (node.name in scope
+					if (isinstance(scope, (FunctionScope, ModuleScope))
+							and node.name in scope
 							and scope[node.name].used
 							and scope[node.name].used[0] is self.scope
 							and node.name not in self.scope.globals):
-						# then it's probably a mistake
-						self.report(messages.UndefinedLocal,
-									scope[node.name].used[1],
-									node.name,
-									scope[node.name].source.lineno)
-						break
+						mistake = scope
+					scope = scope.parent
+				if mistake is not None:
+					# then it's probably a mistake
+					self.report(messages.UndefinedLocal,
+								mistake[node.name].used[1],
+								node.name,
+								mistake[node.name].source.lineno)
 
 			if isinstance(node.parent,
 						  (ast.For, ast.ListCompFor, ast.GenExprFor,
@@ -698,24 +790,366 @@ class Checker(object):
 				importation.used = (self.scope, node.lineno)
 			self.addBinding(node.lineno, importation)
 
+class TracingChecker(Checker):
+	'''
+	Checker printing the tree as it is walked, for debugging.
+	'''
+	nodeDepth = 0
+
+	def handleNode(self, node, parent):
+		print '  ' * self.nodeDepth + node.__class__.__name__
+		self.nodeDepth += 1
+		try:
+			Checker.handleNode(self, node, parent)
+		finally:
+			self.nodeDepth -= 1
+		print '  ' * self.nodeDepth + 'end ' + node.__class__.__name__
+
+class BodyRecord(object):
+	'''
+	What the check of a function body did, so that L{IncrementalChecker}
+	can replay it without walking the body again.  Line numbers are
+	relative to the line before the block of the function.
+
+	@ivar messages: The messages reported while walking the body.
+	@ivar used: (name, line number) pairs of the module scope bindings
+		the body used.
+	@ivar children: The records of the functions defined in the body, in
+		the order they were deferred.
+	@ivar assignments: The messages of its deferred assignment check.
+	@ivar deadScopes: The messages of the check of each scope the body
+		created, in the order they were popped.
+	'''
+	__slots__ = ('messages', 'used', 'children', 'assignments', 'deadScopes')
+
+	def __init__(self):
+		self.messages = []
+		self.used = []
+		self.children = []
+		self.assignments = []
+		self.deadScopes = []
+
+	def moveBy(self, delta):
+		'''moves the line numbers of the record and its children'''
+		self.messages = [moved(message, delta) for message in self.messages]
+		self.used = [(name, lineno + delta) for name, lineno in self.used]
+		self.assignments = [moved(message, delta)
+							for message in self.assignments]
+		self.deadScopes = [[moved(message, delta) for message in found]
+						   for found in self.deadScopes]
+		for child in self.children:
+			child.moveBy(delta)
+
+	def linenos(self):
+		'''the line numbers found in the record and its children'''
+		found = []
+		for message in self.messages + self.assignments + sum(self.deadScopes, []):
+			found.append(message.lineno)
+			if hasattr(message, 'orig_lineno'):
+				found.append(message.orig_lineno)
+		found.extend([lineno for name, lineno in self.used])
+		for child in self.children:
+			found.extend(child.linenos())
+		return found
+
+
+def bindingKind(binding):
+	'''what the function bodies depend on about a module scope binding'''
+	if binding is None:
+		return None
+	elif isinstance(binding, Importation):
+		return 'import'
+	return 'bound'
+
+
+class BlockAnalysis(object):
+	"""
+	The records of the function bodies of a top level block, and what
+	they depend on outside of the block.
+
+	@ivar reads: The L{bindingKind} of the module scope binding of every
+		name the bodies looked up or bound.
+	@ivar cacheable: False when the records may not be replayed: the
+		bodies rebind an imported name (whether that is reported depends on
+		when the other bodies use the import), or report a line outside of
+		the block.
+	"""
+	def __init__(self, checker):
+		self.filename = checker.filename
+		self.importStarred = checker.moduleScope.importStarred
+		self.reads = {}
+		self.records = []
+		self.cacheable = True
+
+	def valid(self, checker):
+		'''tells whether the records hold for the module scope of checker'''
+		if (not self.cacheable or self.filename != checker.filename or
+				self.importStarred != checker.moduleScope.importStarred):
+			return False
+		scope = checker.moduleScope
+		for name, kind in self.reads.iteritems():
+			if bindingKind(scope.get(name)) != kind:
+				return False
+		return True
+
+	def freeze(self, block):
+		'''makes the line numbers of the records relative to the block'''
+		for record in self.records:
+			for lineno in record.linenos():
+				if not block.line < lineno <= block.line + block.lines:
+					self.cacheable = False
+					return
+			record.moveBy(-block.line)
+
+
+def moved(message, delta):
+	'''copy of a message, delta lines further'''
+	message = copy.copy(message)
+	message.lineno += delta
+	if hasattr(message, 'orig_lineno'):
+		message.orig_lineno += delta
+	return message
+
+
+class IncrementalChecker(Checker):
+	"""
+	Checker of a module split in top level blocks (see L{Block}), which
+	replays the check of the function bodies of a block instead of walking
+	them when the module scope bindings they depend on did not change.
+	The module level statements are always walked, so the checker reports
+	the same messages, in the same order, as L{Checker}.
+
+	@ivar record: The L{BodyRecord} of the function body being walked.
+	@ivar analysis: The L{BlockAnalysis} that record belongs to.
+	@ivar deadRecords: For each of C{dead_scopes}, the record of the body
+		which created it and, for replayed bodies (whose scope is None), the
+		messages of the scope with the line of their block.
+	"""
+
+	def __init__(self, blocks, filename='(none)'):
+		self.blocks = blocks
+		self.block = None
+		self.record = None
+		self.analysis = None
+		self.deadRecords = []
+		self.moduleStmt = ast.Stmt([node for block in blocks
+									for node in block.tree.node.nodes])
+		Checker.__init__(self, ast.Module(None, self.moduleStmt), filename)
+
+	def STMT(self, node):
+		if node is not self.moduleStmt:
+			return self.handleChildren(node)
+		for block in self.blocks:
+			self.block = block
+			block.deferred = 0
+			block.reuse = None
+			for child in block.tree.node.nodes:
+				self.handleNode(child, node)
+		self.block = None
+
+	def deferFunction(self, callable):
+		if self.record is not None:
+			analysis, record = self.analysis, BodyRecord()
+			self.record.children.append(record)
+			Checker.deferFunction(self,
+				lambda: self.runRecorded(analysis, record, callable))
+		elif self.block is not None:
+			block, index = self.block, self.block.deferred
+			block.deferred += 1
+			Checker.deferFunction(self,
+				lambda: self.runBody(block, index, callable))
+		else:
+			Checker.deferFunction(self, callable)
+
+	def deferAssignment(self, callable):
+		record = self.record
+		if record is None:
+			return Checker.deferAssignment(self, callable)
+		def runAssignment():
+			start = len(self.messages)
+			callable()
+			record.assignments.extend(self.messages[start:])
+		Checker.deferAssignment(self, runAssignment)
+
+	def runBody(self, block, index, callable):
+		'''
+		Runs or replays the index-th function body deferred by the module
+		level statements of a block; the records of the block are checked
+		once, when its first body is run.
+		'''
+		if block.reuse is None:
+			block.reuse = (block.analysis is not None and
+						   block.analysis.valid(self))
+			if not block.reuse:
+				block.analysis = BlockAnalysis(self)
+		if block.reuse:
+			self.replay(block.analysis.records[index], block.line)
+		else:
+			record = BodyRecord()
+			block.analysis.records.append(record)
+			self.runRecorded(block.analysis, record, callable)
+
+	def runRecorded(self, analysis, record, callable):
+		self.analysis, self.record = analysis, record
+		start = len(self.messages)
+		try:
+			callable()
+		finally:
+			self.analysis, self.record = None, None
+		record.messages = self.messages[start:]
+
+	def replay(self, record, line):
+		'''does what the body of record did, in a block starting after line'''
+		self.replayMessages(record.messages, line)
+		for name, lineno in record.used:
+			# no other body can tell the scope which used the binding
+			self.moduleScope[name].used = (None, lineno + line)
+		for child in record.children:
+			Checker.deferFunction(self,
+				lambda child=child: self.replay(child, line))
+		Checker.deferAssignment(self,
+			lambda: self.replayMessages(record.assignments, line))
+		for found in record.deadScopes:
+			self.dead_scopes.append(None)
+			self.deadRecords.append((None, (found, line)))
+
+	def replayMessages(self, found, line):
+		for message in found:
+			self.messages.append(moved(message, line))
+
+	def popScope(self):
+		Checker.popScope(self)
+		self.deadRecords.append((self.record, None))
+
+	def check_dead_scopes(self):
+		for scope, (record, replayed) in zip(self.dead_scopes,
+											 self.deadRecords):
+			if replayed is not None:
+				self.replayMessages(*replayed)
+			elif record is None:
+				self.checkDeadScope(scope)
+			else:
+				start = len(self.messages)
+				self.checkDeadScope(scope)
+				record.deadScopes.append(self.messages[start:])
+
+	def NAME(self, node):
+		if self.record is None:
+			return Checker.NAME(self, node)
+		binding = self.moduleScope.get(node.name)
+		self.analysis.reads[node.name] = bindingKind(binding)
+		if binding is None:
+			return Checker.NAME(self, node)
+		used = binding.used
+		Checker.NAME(self, node)
+		if binding.used is not used:
+			self.record.used.append((node.name, node.lineno))
+
+	def ASSNAME(self, node):
+		if self.record is not None:
+			self.analysis.reads[node.name] = bindingKind(
+											self.moduleScope.get(node.name))
+		Checker.ASSNAME(self, node)
+
+	def addBinding(self, lineno, value, reportRedef=True):
+		if self.record is not None:
+			kind = bindingKind(self.moduleScope.get(value.name))
+			self.analysis.reads[value.name] = kind
+			if kind == 'import':
+				self.analysis.cacheable = False
+		Checker.addBinding(self, lineno, value, reportRedef)
+
 class OffsetError(messages.Message):
 	message = '%r at offset %r'
+	__slots__ = ('text', 'offset')
+	message_fields = ('text', 'offset')
 	def __init__(self, filename, lineno, text, offset):
 		messages.Message.__init__(self, filename, lineno)
+		self.text = text
 		self.offset = offset
-		self.message_args = (text, offset)
 
 class PythonError(messages.Message):
 	message = '%r'
+	__slots__ = ('text',)
+	message_fields = ('text',)
 	def __init__(self, filename, lineno, text):
 		messages.Message.__init__(self, filename, lineno)
-		self.message_args = (text,)
+		self.text = text
+
+def encoded(code):
+	'''
+	Code as given to the parser module, which only accepts byte strings;
+	compile() encodes unicode code to UTF-8 as well, so offsets are
+	unchanged.  The parser would decode those bytes with the encoding
+	the code declares, so the declaration is blanked out.
+	'''
+	if isinstance(code, unicode):
+		return withoutCoding(code).encode('utf-8')
+	return code
+
+def withoutCoding(code):
+	'''
+	Code with its encoding declaration, if any, replaced by an empty line;
+	like the tokenizer, only the first line, or the second one after a
+	blank or comment line, may declare it.
+	'''
+	first = code.find('\n')
+	if first == -1:
+		first = len(code)
+	if _CODING.match(code, 0, first):
+		return code[first:]
+	if first == len(code) or not _BLANK.match(code, 0, first):
+		return code
+	second = code.find('\n', first + 1)
+	if second == -1:
+		second = len(code)
+	if _CODING.match(code, first + 1, second):
+		return code[:first + 1] + code[second:]
+	return code
+
+def parse(codeString, filename):
+	'''
+	Parses the code only once, for both the syntax check and the tree
+	given to the Checker; raises the same SyntaxErrors as compile().
+	'''
+	syntaxTree = parser.suite(encoded(codeString))
+	# errors such as 'return' outside function are only found when the
+	# parse tree is compiled
+	syntaxTree.compile(filename)
+	return transformer.Transformer().transform(syntaxTree)
+
+def syntaxError(value, filename):
+	'''the message of a SyntaxError raised by parse()'''
+	msg = value.args[0]
+
+	lineno, offset, text = value.lineno, value.offset, value.text
+
+	# If there's an encoding problem with the file, the text is None.
+	if text is None:
+		# Avoid using msg, since for the only known case, it contains a
+		# bogus message that claims the encoding the file declared was
+		# unknown.
+		if msg.startswith('duplicate argument'):
+			arg = msg.split('duplicate argument ',1)[1].split(' ',1)[0].strip('\'"')
+			return messages.DuplicateArgument(filename, lineno, arg)
+		else:
+			return PythonError(filename, lineno, msg)
+	else:
+		line = text.splitlines()[-1]
+
+		if offset is not None:
+			offset = offset - (len(text) - len(line))
+
+		if offset is not None:
+			return OffsetError(filename, lineno, msg, offset)
+		else:
+			return PythonError(filename, lineno, msg)
 
 def check(codeString, filename):
 	codeString = codeString.rstrip()
 	try:
 		try:
-			compile(codeString, filename, "exec")
+			tree = parse(codeString, filename)
 		except MemoryError:
 			# Python 2.4 will raise MemoryError if the source can't be
 			# decoded.
@@ -724,36 +1158,9 @@ def check(codeString, filename):
 			raise
 	except (SyntaxError, IndentationError), value:
 		# print traceback.format_exc() # helps debug new cases
-		msg = value.args[0]
-
-		lineno, offset, text = value.lineno, value.offset, value.text
-
-		# If there's an encoding problem with the file, the text is None.
-		if text is None:
-			# Avoid using msg, since for the only known case, it contains a
-			# bogus message that claims the encoding the file declared was
-			# unknown.
-			if msg.startswith('duplicate argument'):
-				arg = msg.split('duplicate argument ',1)[1].split(' ',1)[0].strip('\'"')
-				error = messages.DuplicateArgument(filename, lineno, arg)
-			else:
-				error = PythonError(filename, lineno, msg)
-		else:
-			line = text.splitlines()[-1]
-
-			if offset is not None:
-				offset = offset - (len(text) - len(line))
-
-			if offset is not None:
-				error = OffsetError(filename, lineno, msg, offset)
-			else:
-				error = PythonError(filename, lineno, msg)
-
-		return [error]
+		return [syntaxError(value, filename)]
 	else:
-		# Okay, it's syntactically valid.  Now parse it into an ast and check
-		# it.
-		tree = compiler.parse(codeString)
+		# Okay, it's syntactically valid.  Now check it.
 		w = Checker(tree, filename)
 		w.messages.sort(lambda a, b: cmp(a.lineno, b.lineno))
 		return w.messages
@@ -761,9 +1168,14 @@ def check(codeString, filename):
 # end pyflakes
 # start sublimelint python plugin
 
-import sys, re
+import keyword, re, sys, threading
+
+from sublimelint.lineindex import index_for
+from sublimelint.spans import Underlines
 
 language = 'Python'
+tier = 'idle'	# analyze() runs once the view is left alone; check_syntax()
+				# runs on every modification
 description =\
 '''* view.run_command("lint", "Python")
         Turns background linter off and runs the default Python linter 
@@ -771,73 +1183,99 @@ description =\
 '''
 
 
-def run(code, view, filename='untitled'):
-	stripped_lines = []
-	good_lines = []
-	lines = code.split('\n')
-	for i, line in enumerate(lines):
-		if not line.strip() or line.strip().startswith('#'):
-			stripped_lines.append(i)
-		else:
-			good_lines.append(line)
-		
-	text = '\n'.join(good_lines)
-	errors = check(text, filename)
+# strings (possibly not closed on the line), comments and numbers are
+# matched only to be skipped
+_NAMES = re.compile(r"[uUbB]?[rR]?(?:'{3}(?:.*?'{3}|.*)|\"{3}(?:.*?\"{3}|.*)"
+					r"|'(?:\\.|[^\\'])*'?|\"(?:\\.|[^\\\"])*\"?)"
+					r"|#.*"
+					r"|\d[\w.]*"
+					r"|(?P<name>[A-Za-z_]\w*(?:\s*\.\s*[A-Za-z_]\w*)*)")
+_DOT = re.compile(r'\s*\.\s*')
+
+def nameColumns(lineText):
+	'''
+	Returns the (start, end) columns of the names found in a line of code
+	as a dictionary, names being keys; attributes are only found as part
+	of a dotted name ("os.path", but not "path" alone).  Strings and
+	comments are skipped.
+	'''
+	columns = {}
+	for match in _NAMES.finditer(lineText):
+		dotted = match.group('name')
+		if dotted is None:
+			continue
+		start = match.start()
+		if '.' not in dotted:
+			if not keyword.iskeyword(dotted):
+				columns.setdefault(dotted, []).append((start, match.end()))
+			continue
+		parts = _DOT.split(dotted)
+		if keyword.iskeyword(parts[0]):
+			continue
+		end = start
+		for position, part in enumerate(parts):
+			end = lineText.index(part, end) + len(part)
+			name = '.'.join(parts[:position + 1])
+			columns.setdefault(name, []).append((start, end))
+	return columns
+
+def wordColumns(lineText, word):
+	'''(start, end) columns of the occurences of a word in a line'''
+	found = []
+	start = lineText.find(word)
+	while start != -1:
+		end = start + len(word)
+		if ((start == 0 or not isIdentifier(lineText[start - 1])) and
+				(end == len(lineText) or not isIdentifier(lineText[end]))):
+			found.append((start, end))
+		start = lineText.find(word, end)
+	return found
+
+def isIdentifier(character):
+	return character.isalnum() or character == '_'
+
+def analyze(code, filename='untitled', options=None):
+	'''analyzes the code and returns the underlined spans, the line
+	numbers to outline and the error messages found on each line'''
+	# the code is checked as it is: blank and comment lines used to be
+	# stripped (and the line numbers of the errors mapped back), but the
+	# only line compile() could choke on - an encoding declaration in
+	# unicode code - is blanked out by encoded()
+	return markErrors(code, check(code, filename))
+
+def check_syntax(code, filename='untitled', options=None):
+	'''analyze() limited to the syntax errors: the code is parsed and
+	compiled, but not checked'''
+	try:
+		parser.suite(encoded(code.rstrip())).compile(filename)
+	except (SyntaxError, IndentationError), value:
+		return markErrors(code, [syntaxError(value, filename)])
+	return markErrors(code, [])
+
+def markErrors(code, errors):
+	'''the results of analyze() for the errors found in code'''
+	index = index_for(code)
 
 	lines = set()
-	underline = []
+	underline = Underlines()
 
 	def underlineRange(lineno, position, length=1):
-		# To underline a region, we use a "hack" specific to SublimeText
-		# where we create a list of empty regions for each character
-		# which we want to underline.  When drawing with
-		# sublime.DRAW_EMPTY_AS_OVERWRITE, such empty regions
-		# will appear as underlined.
-		
-		line = view.full_line(view.text_point(lineno, 0))
-		position += line.begin()
-
-		for i in xrange(length):
-			underline.append(sublime.Region(position + i))
-
-	def underlineRegex(lineno, regex, wordmatch=None, linematch=None):
-		lines.add(lineno)
-		offset = 0
-		
-		line = view.full_line(view.text_point(lineno, 0))
-		lineText = view.substr(line)
-		if linematch:
-			match = re.match(linematch, lineText)
-			if match:
-				lineText = match.group('match')
-				offset = match.start('match')
-			else:
-				return
+		underline.add(lineno, position, position + length)
+
+	columns = {}	# line number -> nameColumns() of the line
+
+	def underlineName(lineno, name):
+		'''underlines the occurences of a (possibly dotted) name in a line
+		of code, ignoring strings, comments and attributes of other names'''
+		if lineno not in columns:
+			columns[lineno] = nameColumns(index.line(lineno))
+		found = columns[lineno].get(name)
+		if not found:
+			# the line must start inside a multi-line string
+			found = wordColumns(index.line(lineno), name)
+		for start, end in found:
+			underline.add(lineno, start, end)
 
-		iters = re.finditer(regex, lineText)
-		results = [(result.start('underline'), result.end('underline')) for result in iters if
-											not wordmatch or result.group('underline') == wordmatch]
-
-		for start, end in results:
-			underlineRange(lineno, start+offset, end-start)
-	
-	def underlineWord(lineno, word):
-		regex = r'((and|or|not|if|elif|while|in)\s+|[+\-*^%%<>=\(\{])*\s*(?P<underline>[\w\.]*%s[\w]*)' % (word)
-		underlineRegex(lineno, regex, word)
-	
-	def underlineImport(lineno, word):
-		linematch = 'import\s+(?P<match>[^#;]+)'
-		regex = '(^|\s+|,\s*|as\s+)(?P<underline>[\w]*%s[\w]*)' % word
-		underlineRegex(lineno, regex, word, linematch)
-	
-	def underlineForVar(lineno, word):
-		regex = 'for\s+(?P<underline>[\w]*%s[\w*])' % word
-		underlineRegex(lineno, regex, word)
-	
-	def underlineDuplicateArgument(lineno, word):
-		regex = 'def [\w_]+\(.*?(?P<underline>[\w]*%s[\w]*)' % word
-		underlineRegex(lineno, regex, word)
-	
 	errorMessages = {}
 	def addMessage(lineno, message):
 		message = str(message)
@@ -848,32 +1286,27 @@ def run(code, view, filename='untitled'):
 
 	for error in errors:
 		error.lineno -= 1
-		for i in stripped_lines:
-			if error.lineno >= i:
-				error.lineno += 1
-		
 		lines.add(error.lineno)
 		addMessage(error.lineno, error)
-		if isinstance(error, (OffsetError, PythonError)):
+		if isinstance(error, OffsetError):
 			underlineRange(error.lineno, error.offset)
 
+		elif isinstance(error, PythonError):
+			pass	# no position within the line is known
+
 		elif isinstance(error, (messages.RedefinedWhileUnused,
 								messages.UndefinedName,
 								messages.UndefinedExport,
 								messages.UndefinedLocal,
 								messages.RedefinedFunction,
-								messages.UnusedVariable)):
-			underlineWord(error.lineno, error.name)
-
-		elif isinstance(error, messages.ImportShadowedByLoopVar):
-			underlineForVar(error.lineno, error.name)
+								messages.UnusedVariable,
+								messages.ImportShadowedByLoopVar,
+								messages.UnusedImport,
+								messages.DuplicateArgument)):
+			underlineName(error.lineno, error.name)
 
-		elif isinstance(error, (messages.UnusedImport, 
-								messages.ImportStarUsed)):
-			underlineImport(error.lineno, '\*')
-
-		elif isinstance(error, messages.DuplicateArgument):
-			underlineDuplicateArgument(error.lineno, error.name)
+		elif isinstance(error, messages.ImportStarUsed):
+			pass
 
 		elif isinstance(error, messages.LateFutureImport):
 			pass
@@ -882,3 +1315,223 @@ def run(code, view, filename='untitled'):
 			print 'Oops, we missed an error type!'
 	
 	return underline, lines, errorMessages
+
+# what is skipped to find the lines starting a top level statement: comments,
+# strings, brackets and escaped newlines
+_SCAN = re.compile(r'[#\'"\\()\[\]{}\n]')
+_STRING_ENDS = {
+	"'": re.compile(r"(?:[^'\\\n]|\\.)*'?", re.S),
+	'"': re.compile(r'(?:[^"\\\n]|\\.)*"?', re.S),
+	"'''": re.compile(r"(?:[^'\\]|\\.|'(?!''))*(?:'''|$)", re.S),
+	'"""': re.compile(r'(?:[^"\\]|\\.|"(?!""))*(?:"""|$)', re.S),
+}
+_CLAUSE = re.compile(r'(?:else|elif|except|finally)\b')
+_DEFINITION = re.compile(r'(?:def|class)\b|@')
+_CODING = re.compile(r'^[ \t\f]*#.*coding[:=]', re.M)
+_BLANK = re.compile(r'[ \t\f]*(?:#.*)?$')
+
+def statementStarts(code):
+	'''
+	Yields the offsets of the lines of code which are not inside brackets,
+	strings or escaped newlines: those starting with a non blank character
+	begin a top level statement, or one of its clauses.
+	'''
+	yield 0
+	depth = 0
+	position = 0
+	search = _SCAN.search
+	while True:
+		found = search(code, position)
+		if found is None:
+			return
+		character = found.group()
+		position = found.end()
+		if character == '\n':
+			if depth == 0:
+				yield position
+		elif character == '#':
+			position = code.find('\n', position)
+			if position == -1:
+				return
+		elif character in '([{':
+			depth += 1
+		elif character in ')]}':
+			depth -= 1
+		elif character == '\\':
+			position += 1
+		else:
+			if code.startswith(character * 3, position - 1):
+				character *= 3
+				position += 2
+			position = _STRING_ENDS[character].match(code, position).end()
+
+def splitBlocks(code):
+	'''
+	Splits code in top level blocks: each function or class definition
+	(decorators included) is a block, and so is each run of other
+	statements.  Returns (number of lines before the block, text) pairs.
+	'''
+	offsets = [0]
+	first = True
+	definition = decorated = False
+	for start in statementStarts(code):
+		character = code[start:start + 1]
+		if (not character or character in ' \t\f#\r\n' or
+				_CLAUSE.match(code, start)):
+			continue
+		if decorated:
+			# the definition following a decorator
+			decorated = character == '@'
+			definition = True
+			continue
+		decorated = character == '@'
+		starts = _DEFINITION.match(code, start) is not None
+		if not first and (starts or definition):
+			offsets.append(start)
+		first = False
+		definition = starts
+
+	blocks = []
+	line = 0
+	for begin, end in zip(offsets, offsets[1:] + [len(code)]):
+		text = code[begin:end]
+		blocks.append((line, text))
+		line += text.count('\n')
+	return blocks
+
+def secondLineEnd(code):
+	'''offset of the end of the first two lines of code'''
+	end = code.find('\n')
+	if end != -1:
+		end = code.find('\n', end + 1)
+	if end == -1:
+		return len(code)
+	return end
+
+def shiftLines(tree, delta):
+	'''adds delta to the line numbers of the nodes of a tree'''
+	nodes = [tree]
+	while nodes:
+		node = nodes.pop()
+		if node.lineno is not None:
+			node.lineno += delta
+		nodes.extend(node.getChildNodes())
+
+class Block(object):
+	'''
+	A top level block of a module (see splitBlocks()), parsed on its own;
+	the line numbers of its tree are those of the whole module.
+	'''
+	def __init__(self, text, line):
+		self.text = text
+		self.line = line	# number of lines before the block
+		self.lines = text.count('\n') + 1
+		self.tree = None
+		self.analysis = None	# see BlockAnalysis
+		self.reuse = None	# whether the analysis is replayed this time
+		self.deferred = 0	# function bodies deferred this time
+
+	def moveTo(self, line):
+		if line != self.line:
+			if self.tree is not None:
+				shiftLines(self.tree, line - self.line)
+			self.line = line
+
+class Incremental(object):
+	'''
+	analyze() keeping the blocks of its previous call: the blocks whose
+	text is unchanged are not parsed again, and the check of their
+	function bodies is replayed unless a module scope binding they use
+	changed.
+	'''
+	# below this size, splitting the module costs about as much as parsing
+	# it again
+	minimum_size = 4096
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.blocks = {}	# text -> Blocks of the previous call
+
+	def analyze(self, code, filename='untitled', options=None):
+		'''same as the module level analyze()'''
+		self.lock.acquire()
+		try:
+			return markErrors(code, self.check(code, filename))
+		finally:
+			self.lock.release()
+
+	def check(self, code, filename):
+		'''same as the module level check()'''
+		code = code.rstrip()
+		if (len(code) < self.minimum_size or '__future__' in code or
+				_CODING.search(code, 0, secondLineEnd(code))):
+			# future imports must come first in the whole module, and an
+			# encoding declaration applies to all of its blocks
+			self.blocks = {}
+			return check(code, filename)
+
+		previous, self.blocks = self.blocks, {}
+		blocks = []
+		for line, text in splitBlocks(code):
+			if previous.get(text):
+				block = previous[text].pop()
+				block.moveTo(line)
+			else:
+				block = Block(text, line)
+			blocks.append(block)
+			self.blocks.setdefault(text, []).append(block)
+
+		try:
+			error = self.parse(blocks, filename)
+			if error is not None:
+				return [error]
+			w = IncrementalChecker(blocks, filename)
+		except:
+			# the records of a walk cut short must not be replayed: the
+			# next call checks the whole module again
+			for block in blocks:
+				block.analysis = None
+			self.blocks = {}
+			raise
+		for block in blocks:
+			if block.reuse is False:
+				block.analysis.freeze(block)
+				if not block.analysis.cacheable:
+					block.analysis = None
+		w.messages.sort(lambda a, b: cmp(a.lineno, b.lineno))
+		return w.messages
+
+	def parse(self, blocks, filename):
+		'''
+		Parses the blocks which were not parsed yet, in the same steps as
+		parse() so that the first error is the one parse() raises for the
+		whole module; returns the message of the error, if any.
+		'''
+		fresh = [block for block in blocks if block.tree is None]
+		syntaxTrees = []
+		try:
+			for block in fresh:
+				syntaxTrees.append(parser.suite(encoded(block.text)))
+		except (SyntaxError, IndentationError), value:
+			following = blocks.index(block) + 1
+			if following < len(blocks):
+				# the error may only be found on the first token after the
+				# block, as it is in the whole module
+				try:
+					parser.suite(encoded(block.text + blocks[following].text))
+				except (SyntaxError, IndentationError), value:
+					pass
+			return self.syntaxError(value, block, filename)
+		try:
+			for block, syntaxTree in zip(fresh, syntaxTrees):
+				syntaxTree.compile(filename)
+		except (SyntaxError, IndentationError), value:
+			return self.syntaxError(value, block, filename)
+		for block, syntaxTree in zip(fresh, syntaxTrees):
+			block.tree = transformer.Transformer().transform(syntaxTree)
+			shiftLines(block.tree, block.line)
+
+	def syntaxError(self, value, block, filename):
+		if value.lineno is not None:
+			value.lineno += block.line
+		return syntaxError(value, filename)
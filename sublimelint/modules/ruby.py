@@ -1,35 +1,40 @@
 # ruby.py - sublimelint package for checking ruby files
 
-import subprocess, os
-
-def check(codeString, filename):
-  info = None
-  if os.name == 'nt':
-    info = subprocess.STARTUPINFO()
-    info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-    info.wShowWindow = subprocess.SW_HIDE
-
-  process = subprocess.Popen(('ruby', '-wc'), 
-                stdin=subprocess.PIPE, 
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                startupinfo=info)
-  result = process.communicate(codeString)[0]
-  
-  return result
+import subprocess
+
+from sublimelint.daemons import helper_path, resident_worker
+from sublimelint.processes import RUNNER
+
+timeout = 10  # seconds after which ruby is killed
+
+def check(codeString, filename, resident=False):
+  if resident:
+    daemon = resident_worker('ruby', ('ruby', helper_path('ruby_daemon.rb')))
+    result = daemon.check(codeString, timeout)
+    if result is not None:
+      return result
+  return RUNNER.communicate(('ruby', '-wc'), codeString, timeout,
+                            stderr=subprocess.STDOUT)
 
 # start sublimelint php plugin
 import re
-__all__ = ['run', 'language']
+__all__ = ['analyze', 'language']
 language = 'Ruby'
+settings = ('sublimelint_resident_workers',)
+tier = 'idle'	# see the TIERS of the plugin
 description =\
 '''* view.run_command("lint", "Ruby")
         Turns background linter off and runs the default Ruby linter
         (ruby -c, assumed to be on $PATH) on current view.
+
+        If the user preference "sublimelint_resident_workers" is true, a
+        ruby process is kept running in the background to check the code
+        instead of starting a new one for every check.
 '''
 
-def run(code, view, filename='untitled'):
-  errors = check(code, filename)
+def analyze(code, filename='untitled', options=None):
+  resident = options and options.get('sublimelint_resident_workers')
+  errors = check(code, filename, resident)
   
   lines = set()
   underline = [] # leave this here for compatibility with original plugin
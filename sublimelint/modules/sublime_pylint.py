@@ -1,90 +1,232 @@
-''' sublime_pylint.py - sublimelint package for checking python files
-
-pylint is not available as a checker that runs in the background
-as it generally takes much too long.
-'''
-
-from StringIO import StringIO
-import tempfile
-try:
-	from pylint import checkers
-	from pylint import lint
-	PYLINT_AVAILABLE = True
-except ImportError:
-	print "pylint is not available"
-	PYLINT_AVAILABLE = False
-
-language = 'pylint'
-description =\
-'''* view.run_command("lint", "pylint")
-        Turns background linter off and runs pylint on current view.
-'''
-
-def run_pylint(code):
-   	'''runs pylint on the code using a temporary file for storage'''
-	linter = lint.PyLinter()
-	checkers.initialize(linter)
-	# Disable some errors.
-	linter.load_command_line_configuration([
-		'--module-rgx=.*',  # don't check the module name
-		'--reports=n',      # remove tables
-		'--persistent=n',   # don't save the old score (no sense for temp)
-	])
-
-	temp = tempfile.NamedTemporaryFile(suffix = '.py')
-	temp.write(code)
-	temp.flush()
-
-	output_buffer = StringIO()
-	linter.reporter.set_output(output_buffer)
-	linter.check(temp.name)
-	_report = output_buffer.getvalue().replace(temp.name, 'line ')
-
-	output_buffer.close()
-	temp.close()
-
-	return _report
-
-
-def remove_unwanted(errors):
-	'''remove unwanted warnings'''
-	## todo: investigate how this can be set by a user preference
-	#  as it appears that the user pylint configuration file is ignored.
-	lines = errors.split('\n')
-	wanted = []
-	unwanted = ["Found indentation with tabs instead of spaces",
-				"************* Module"]
-	for line in lines:
-		for not_include in unwanted:
-			if not_include in line:
-				break
-		else:
-			wanted.append(line)
-	return '\n'.join(wanted)
-
-def run(code, *dummy):
-	'''the common entry point to all linters'''
-	if not PYLINT_AVAILABLE:
-		return [], [], {}
-
-	errors = run_pylint(code)
-	errors = remove_unwanted(errors)
-
-	lines = set()
-	error_messages = {}
-	
-	for line in errors.splitlines():
-		info = line.split(":")
-		try:
-			lineno = info[1]
-		except IndexError:
-			print info
-		message = ":".join(info[2:])
-		lineno = int(lineno) - 1
-		lines.add(lineno)
-		if lineno in error_messages:
-			error_messages[lineno].append(message)
-		else:
-			error_messages[lineno] = [message]
-
-	return [], lines, error_messages
+''' sublime_pylint.py - sublimelint package for checking python files
+
+pylint does not run in the background as the code is edited, as it
+generally takes much too long; it runs when the file is saved instead
+(the "save" tier of the plugin).
+
+Most of that time used to be spent setting pylint up again for every
+run; a single PyLinter is now configured the first time it is needed and
+reused afterwards.  The code is checked from memory, and astroid keeps
+the modules it imports in its cache from one run to the next.
+'''
+
+import os
+import tempfile
+import threading
+try:
+	from pylint import checkers
+	from pylint import lint
+	from pylint.interfaces import IReporter
+	from pylint.reporters import BaseReporter
+	PYLINT_AVAILABLE = True
+except ImportError:
+	print "pylint is not available"
+	PYLINT_AVAILABLE = False
+try:
+	import astroid
+	from astroid.builder import AstroidBuilder
+	from pylint import interfaces, utils
+	# the internals used by PylintEngine._check_source() only exist in
+	# recent versions of pylint 1.x; older ones can only check files
+	IN_MEMORY = PYLINT_AVAILABLE and (
+		hasattr(interfaces, 'implements') and
+		hasattr(utils, 'PyLintASTWalker') and hasattr(utils, 'FileState') and
+		hasattr(astroid, 'AstroidSyntaxError') and
+		hasattr(astroid, 'MANAGER') and
+		hasattr(lint.PyLinter, 'prepare_checkers') and
+		hasattr(lint.PyLinter, 'check_astroid_module'))
+except ImportError:
+	IN_MEMORY = False
+
+language = 'pylint'
+syntax = 'Python'	# linted views, when not named after the language
+# too slow to run while the code is edited: pylint runs when the view is
+# saved (or left alone for "sublimelint_long_idle_delay" seconds)
+tier = PYLINT_AVAILABLE and 'save' or None
+description =\
+'''* view.run_command("lint", "pylint")
+        Turns background linter off and runs pylint on current view.
+        Unless the user preference "sublimelint_save_tier" is false,
+        pylint also runs every time a Python file is saved.
+'''
+
+## todo: investigate how this can be set by a user preference
+#  as it appears that the user pylint configuration file is ignored.
+UNWANTED = ["Found indentation with tabs instead of spaces"]
+
+ENGINE = None	# PylintEngine, created when first needed
+ENGINE_LOCK = threading.Lock()
+
+
+if PYLINT_AVAILABLE:
+	class MessageCollector(BaseReporter):
+		'''pylint reporter keeping the messages instead of printing them'''
+		__implements__ = IReporter
+		name = 'sublimelint'
+		extension = 'txt'
+
+		def __init__(self):
+			BaseReporter.__init__(self)
+			self.messages = []
+
+		def handle_message(self, msg):
+			'''called by pylint 1.0 and later'''
+			self.messages.append((msg.line, msg.msg_id, msg.msg))
+
+		def add_message(self, msg_id, location, msg):
+			'''called by older versions of pylint'''
+			self.messages.append((location[3], msg_id, msg))
+
+		def _display(self, layout):
+			pass
+
+
+class PylintEngine(object):
+	'''a PyLinter configured once and reused for every check'''
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.reporter = MessageCollector()
+		self.linter = lint.PyLinter()
+		if hasattr(self.linter, 'load_default_plugins'):
+			self.linter.load_default_plugins()
+		else:
+			checkers.initialize(self.linter)
+		# Disable some errors.
+		self.linter.load_command_line_configuration([
+			'--module-rgx=.*',  # don't check the module name
+			'--reports=n',      # remove tables
+			'--persistent=n',   # don't save the old score (no sense for temp)
+		])
+		self.linter.set_reporter(self.reporter)
+		self.in_memory = IN_MEMORY
+		if self.in_memory:
+			# done by PyLinter.check() once all messages are registered
+			try:
+				for msg in self.linter.msgs_store.messages:
+					if not msg.may_be_emitted():
+						self.linter._msgs_state[msg.msgid] = False
+			except AttributeError:
+				self.in_memory = False
+
+	def check(self, code, filename='untitled'):
+		'''returns the (line, message id, message) tuples found by pylint'''
+		self.lock.acquire()
+		try:
+			self.reporter.messages = []
+			if self.in_memory:
+				try:
+					self._check_source(code, filename)
+					return self.reporter.messages
+				except AttributeError, excp:
+					# this version of pylint lacks one of the internals used
+					print 'pylint: cannot check code from memory (%s)' % excp
+					self.in_memory = False
+					self.reporter.messages = []
+			self._check_file(code)
+			return self.reporter.messages
+		finally:
+			self.lock.release()
+
+	def _check_source(self, code, filename):
+		'''checks the code from memory, the way PyLinter.check would do
+		   for a file'''
+		linter = self.linter
+		if isinstance(code, str):
+			code = code.decode('utf-8', 'replace')
+		modname = os.path.splitext(os.path.basename(filename))[0]
+		path = None
+		if filename != 'untitled':
+			path = filename
+
+		walker = utils.PyLintASTWalker(linter)
+		_checkers = linter.prepare_checkers()
+		tokencheckers = [c for c in _checkers
+						if interfaces.implements(c, interfaces.ITokenChecker)
+						and c is not linter]
+		rawcheckers = [c for c in _checkers
+						if interfaces.implements(c, interfaces.IRawChecker)]
+		for checker in _checkers:
+			checker.open()
+			if interfaces.implements(checker, interfaces.IAstroidChecker):
+				walker.add_checker(checker)
+
+		linter.set_current_module(modname, path)
+		# the code being edited must not replace a module of the same name
+		# in astroid's cache; only the modules it imports are worth keeping
+		cache = astroid.MANAGER.astroid_cache
+		cached = cache.get(modname)
+		try:
+			try:
+				module = AstroidBuilder(astroid.MANAGER).string_build(code,
+																modname, path)
+			except astroid.AstroidSyntaxError, excp:
+				linter.add_message('syntax-error',
+									line=getattr(excp.error, 'lineno', 0),
+									args=str(excp.error))
+			else:
+				linter.file_state = utils.FileState(modname)
+				linter._ignore_file = False
+				linter.current_file = path
+				linter.check_astroid_module(module, walker, rawcheckers,
+																tokencheckers)
+		finally:
+			if cached is None:
+				cache.pop(modname, None)
+			else:
+				cache[modname] = cached
+
+		for checker in reversed(_checkers):
+			checker.close()
+
+	def _check_file(self, code):
+		'''checks the code using a temporary file for storage'''
+		if isinstance(code, unicode):
+			code = code.encode('utf-8')
+		temp = tempfile.NamedTemporaryFile(suffix = '.py')
+		temp.write(code)
+		temp.flush()
+		try:
+			self.linter.check(temp.name)
+		finally:
+			temp.close()
+
+
+def get_engine():
+	'''returns the shared pylint engine, creating it if needed'''
+	global ENGINE
+	ENGINE_LOCK.acquire()
+	try:
+		if ENGINE is None:
+			ENGINE = PylintEngine()
+		return ENGINE
+	finally:
+		ENGINE_LOCK.release()
+
+
+def is_wanted(message):
+	'''filters out unwanted warnings'''
+	for not_include in UNWANTED:
+		if not_include in message:
+			return False
+	return True
+
+def analyze(code, filename='untitled', options=None):
+	'''the common entry point to all linters'''
+	if not PYLINT_AVAILABLE:
+		return [], [], {}
+
+	lines = set()
+	error_messages = {}
+
+	for line, msg_id, message in get_engine().check(code, filename):
+		if not is_wanted(message):
+			continue
+		message = '%s: %s' % (msg_id, message)
+		lineno = max((line or 1) - 1, 0)
+		lines.add(lineno)
+		if lineno in error_messages:
+			error_messages[lineno].append(message)
+		else:
+			error_messages[lineno] = [message]
+
+	return [], lines, error_messages
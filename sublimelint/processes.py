@@ -0,0 +1,141 @@
+'''Runs the external programs used by some linters (php, ruby...).
+
+Every process is started with a timeout after which it is killed, and
+is tagged with the view and generation it was started for, so that it
+can be killed as soon as a newer generation of the same view is queued.
+The number of external processes running at the same time is capped.
+'''
+import os
+import subprocess
+import threading
+
+
+def startupinfo():
+    '''keeps a console window from popping up on Windows'''
+    info = None
+    if os.name == 'nt':
+        info = subprocess.STARTUPINFO()
+        info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        info.wShowWindow = subprocess.SW_HIDE
+    return info
+
+
+class ProcessCancelled(Exception):
+    '''the process was killed because its result is no longer wanted'''
+
+
+class ProcessTimeout(Exception):
+    '''the process was killed because it ran for too long'''
+
+
+class ProcessRunner(object):
+    '''starts external processes on behalf of linters'''
+    def __init__(self, max_processes=4):
+        self.slots = threading.Semaphore(max_processes)
+        self.lock = threading.Lock()
+        self.running = {}       # owner -> list of [generation, process, reason]
+        self.wanted = {}        # owner -> oldest generation still wanted
+        self.local = threading.local()
+
+    def bind(self, owner, generation):
+        '''tags the processes started from the current thread with the
+           view (owner) and generation they are linting; a generation of
+           None is never cancelled'''
+        self.local.owner = owner
+        self.local.generation = generation
+
+    def unbind(self):
+        '''removes the tag set by bind()'''
+        self.local.owner = self.local.generation = None
+
+    def cancel(self, owner, generation):
+        '''kills the processes started for an older generation of owner'''
+        self.lock.acquire()
+        try:
+            self.wanted[owner] = generation
+            for entry in self.running.get(owner, ()):
+                if entry[0] is not None and entry[0] < generation:
+                    self._kill(entry, 'cancelled')
+        finally:
+            self.lock.release()
+
+    def forget(self, owner):
+        '''drops the information kept about a (closed) view'''
+        self.lock.acquire()
+        try:
+            self.wanted.pop(owner, None)
+        finally:
+            self.lock.release()
+
+    def communicate(self, args, data, timeout, stderr=None):
+        '''runs a program with data as its input and returns its output;
+           raises ProcessCancelled or ProcessTimeout if it had to be killed'''
+        owner = getattr(self.local, 'owner', None)
+        generation = getattr(self.local, 'generation', None)
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+
+        self.slots.acquire()
+        try:
+            self.lock.acquire()
+            try:
+                if self._superseded(owner, generation):
+                    raise ProcessCancelled(args[0])
+                entry = [generation, self._start(args, stderr), None]
+                self.running.setdefault(owner, []).append(entry)
+            finally:
+                self.lock.release()
+
+            timer = threading.Timer(timeout, self._expire, (entry,))
+            timer.start()
+            try:
+                output = entry[1].communicate(data)[0]
+            finally:
+                timer.cancel()
+                self.lock.acquire()
+                try:
+                    self.running[owner].remove(entry)
+                    if not self.running[owner]:
+                        del self.running[owner]
+                finally:
+                    self.lock.release()
+        finally:
+            self.slots.release()
+
+        if entry[2] == 'cancelled':
+            raise ProcessCancelled(args[0])
+        elif entry[2] == 'timeout':
+            raise ProcessTimeout('%s did not finish within %s seconds' %
+                                                        (args[0], timeout))
+        return output
+
+    def _start(self, args, stderr):
+        return subprocess.Popen(args,
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=stderr,
+                                startupinfo=startupinfo())
+
+    def _superseded(self, owner, generation):
+        wanted = self.wanted.get(owner)
+        return (generation is not None and wanted is not None
+                                            and generation < wanted)
+
+    def _expire(self, entry):
+        self.lock.acquire()
+        try:
+            self._kill(entry, 'timeout')
+        finally:
+            self.lock.release()
+
+    def _kill(self, entry, reason):
+        if entry[2] is not None or entry[1].returncode is not None:
+            return
+        entry[2] = reason
+        try:
+            entry[1].kill()
+        except OSError:
+            pass    # already finished
+
+
+RUNNER = ProcessRunner()
@@ -0,0 +1,175 @@
+'''Keeps track of the views waiting to be examined by a linter.
+
+Every view has a generation counter which is incremented each time its
+buffer is modified.  A lint run is only worth starting - and its results
+only worth displaying - if it was scheduled for the latest generation
+of the view; anything older is silently dropped.
+
+Linters are run in tiers (see the TIERS of the plugin): each view can
+be queued once for each tier, with its own delay, so that the cheap
+linters run as soon as the view is modified while the expensive ones
+wait for the view to be left alone.
+
+Among the views which are due, the one the user is looking at is
+linted first, then the other visible views (those shown in a group of a
+window), then the background tabs.  Only a few runs on background tabs
+may be in flight at once, so that opening many files does not keep the
+editor busy: the plugin reports the end of each run with finished().
+
+The background thread sleeps on a condition variable and is woken up
+as soon as a view is queued, instead of polling at a fixed interval.
+'''
+import threading
+import time
+
+# priorities of the views, the lowest first
+ACTIVE, VISIBLE, BACKGROUND = 0, 1, 2
+
+
+class Scheduler(object):
+    '''queue of views waiting to be linted'''
+    def __init__(self, delay=0.1, background=1):
+        '''delay is the quiet time (in seconds) a view must have before
+           being linted; it is restarted every time the view is queued.
+           background is the number of runs on background tabs which may
+           be in flight at once (0 to lint them only once they are shown)'''
+        self.delay = delay
+        self.background = background
+        self.condition = threading.Condition()
+        self.generations = {}   # view id -> latest generation
+        self.pending = {}       # (view id, tier) -> (due time, generation,
+                                #                     view)
+        self.active = None      # id of the view which has the focus
+        self.visible = set()    # ids of the views shown in a window
+        self.running = {}       # (view id, tier) -> number of runs on a
+                                # background tab in flight
+
+    def bump(self, view):
+        '''signals that the content of a view changed; any run started
+           for a previous generation of the view becomes stale'''
+        self.condition.acquire()
+        try:
+            vid = view.id()
+            self.generations[vid] = self.generations.get(vid, 0) + 1
+            return self.generations[vid]
+        finally:
+            self.condition.release()
+
+    def queue(self, view, tier=None, delay=None):
+        '''schedules a tier of linters to run on a view once it has been
+           quiet for delay seconds (self.delay by default)'''
+        if delay is None:
+            delay = self.delay
+        self.condition.acquire()
+        try:
+            vid = view.id()
+            generation = self.generations.setdefault(vid, 0)
+            self.pending[vid, tier] = (time.time() + delay, generation, view)
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def focus(self, active, visible, background=None):
+        '''records the view which has the focus and the views which are
+           visible (their ids), and possibly a new limit of background
+           runs'''
+        self.condition.acquire()
+        try:
+            self.active = active
+            self.visible = set(visible)
+            if background is not None:
+                self.background = background
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def priority(self, vid):
+        '''ACTIVE, VISIBLE or BACKGROUND'''
+        if vid == self.active:
+            return ACTIVE
+        if vid in self.visible:
+            return VISIBLE
+        return BACKGROUND
+
+    def known(self, vid):
+        '''True if a view has ever been queued or modified'''
+        return vid in self.generations
+
+    def finished(self, vid, tier):
+        '''signals the end of a run returned by wait()'''
+        self.condition.acquire()
+        try:
+            key = vid, tier
+            if key in self.running:
+                self.running[key] -= 1
+                if not self.running[key]:
+                    del self.running[key]
+                self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def generation(self, vid):
+        '''returns the latest generation of a view'''
+        return self.generations.get(vid, 0)
+
+    def is_current(self, vid, generation):
+        '''True if no modification happened since "generation"'''
+        return generation is None or self.generations.get(vid, 0) == generation
+
+    def forget(self, vid):
+        '''drops all information about a (closed) view'''
+        self.condition.acquire()
+        try:
+            self.generations.pop(vid, None)
+            self.visible.discard(vid)
+            for key in self.pending.keys():
+                if key[0] == vid:
+                    del self.pending[key]
+            for key in self.running.keys():
+                if key[0] == vid:
+                    del self.running[key]
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def wait(self):
+        '''blocks until a queued view is due and returns the one with the
+           highest priority, along with the generation and the tier it was
+           queued for; views in the background wait while too many runs on
+           background tabs are in flight'''
+        self.condition.acquire()
+        try:
+            while True:
+                key, wake = self._next_due(time.time())
+                if key is None:
+                    # None (nothing to wait for) waits until notified
+                    self.condition.wait(wake)
+                    continue
+                due, generation, view = self.pending.pop(key)
+                vid, tier = key
+                if self.is_current(vid, generation):
+                    if self.priority(vid) == BACKGROUND:
+                        self.running[key] = self.running.get(key, 0) + 1
+                    return view, generation, tier
+        finally:
+            self.condition.release()
+
+    def _next_due(self, now):
+        '''returns the key of the pending view to lint first, or None and
+           the number of seconds until one is due (None if no view can
+           be linted for now)'''
+        busy = sum(self.running.itervalues()) >= self.background
+        best = None
+        wake = None
+        for key, (due, generation, view) in self.pending.iteritems():
+            priority = self.priority(key[0])
+            if priority == BACKGROUND and busy:
+                continue
+            if due > now:
+                if wake is None or due - now < wake:
+                    wake = due - now
+            elif best is None or (priority, due) < best[0]:
+                best = (priority, due), key
+        if best is None:
+            return None, wake
+        return best[1], None
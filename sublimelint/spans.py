@@ -0,0 +1,55 @@
+'''Compact storage for the character ranges underlined by linters.
+
+A long undefined dotted name used to be stored as one Region per
+character; linters now only record the (start, end) span of what they
+want underlined, and spans are merged before any Region is built.
+'''
+from array import array
+
+
+class Underlines(array):
+    '''flat array of (line number, start column, end column) triples'''
+    __slots__ = ()
+
+    def __new__(cls):
+        return array.__new__(cls, 'l')
+
+    def __reduce__(self):
+        return _rebuild_underlines, (self.tolist(),)
+
+    def add(self, lineno, start, end):
+        '''records that columns [start, end) of a line are underlined'''
+        self.extend((lineno, start, end))
+
+    def spans(self):
+        '''iterates over the (line number, start, end) triples'''
+        for index in xrange(0, len(self), 3):
+            yield self[index], self[index + 1], self[index + 2]
+
+    def by_line(self):
+        '''returns a dict mapping line numbers to their merged spans'''
+        lines = {}
+        for lineno, start, end in self.spans():
+            lines.setdefault(lineno, []).append((start, end))
+        for lineno, spans in lines.iteritems():
+            lines[lineno] = merge_spans(spans)
+        return lines
+
+
+def _rebuild_underlines(values):
+    underlines = Underlines()
+    underlines.extend(values)
+    return underlines
+
+
+def merge_spans(spans):
+    '''merges overlapping or adjacent (start, end) spans, returning them
+       sorted by position'''
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
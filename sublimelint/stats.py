@@ -0,0 +1,192 @@
+'''Timing instrumentation for the linters.
+
+The plugin records how long each phase of a lint run took (taking the
+snapshot of the buffer, waiting in a queue, analyzing the code, building
+and drawing the regions...) for every linter, as well as counters such
+as the number of runs and of cache hits.  Only the most recent samples
+are kept for each linter and phase, so that the statistics reflect what
+the editor is currently doing.
+
+Samples can also be appended to a file, one JSON object per line, for
+offline analysis.
+'''
+import collections
+import json
+import threading
+import time
+
+# upper bounds (in milliseconds) of the buckets of the histograms
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram(object):
+    '''rolling window of the most recent durations of something'''
+    def __init__(self, size=256):
+        self.samples = collections.deque(maxlen=size)
+        self.count = 0      # samples ever added, including forgotten ones
+        self.total = 0.0
+
+    def add(self, seconds):
+        '''adds a duration (in seconds)'''
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, fraction):
+        '''duration below which fraction of the recent samples lie'''
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def buckets(self):
+        '''number of recent samples in each bucket of BUCKETS, followed
+           by the number of samples above the last bucket'''
+        counts = [0] * (len(BUCKETS) + 1)
+        for seconds in self.samples:
+            milliseconds = seconds * 1000
+            for position, bound in enumerate(BUCKETS):
+                if milliseconds < bound:
+                    counts[position] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return counts
+
+    def summary(self):
+        '''statistics of the recent samples, in milliseconds'''
+        samples = self.samples
+        recent = len(samples)
+        return {'count': self.count,
+                'recent': recent,
+                'mean': recent and sum(samples) / recent * 1000,
+                'p50': self.percentile(0.5) * 1000,
+                'p90': self.percentile(0.9) * 1000,
+                'p99': self.percentile(0.99) * 1000,
+                'max': recent and max(samples) * 1000}
+
+
+class Stats(object):
+    '''timings and counters of the linters, safe to update from any
+       thread'''
+    def __init__(self, window=256):
+        self.window = window
+        self.lock = threading.Lock()
+        self.histograms = {}    # (linter, phase) -> Histogram
+        self.counters = {}      # (linter, name) -> count
+        self.export_path = None
+        self.exported = []      # samples waiting to be written
+
+    def export_to(self, path):
+        '''appends every sample to path (None to stop exporting)'''
+        self.lock.acquire()
+        try:
+            if path != self.export_path:
+                self._flush()
+                self.export_path = path
+        finally:
+            self.lock.release()
+
+    def record(self, linter, phase, seconds):
+        '''adds the duration of a phase of a linter run'''
+        self.lock.acquire()
+        try:
+            key = linter, phase
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.window)
+            histogram.add(seconds)
+            if self.export_path:
+                self.exported.append({'time': time.time(), 'linter': linter,
+                                      'phase': phase, 'seconds': seconds})
+                if len(self.exported) >= 64:
+                    self._flush()
+        finally:
+            self.lock.release()
+
+    def since(self, linter, phase, start):
+        '''records the time elapsed since start (a time.time() value)'''
+        self.record(linter, phase, time.time() - start)
+
+    def count(self, linter, name, number=1):
+        '''increments a counter'''
+        self.lock.acquire()
+        try:
+            key = linter, name
+            self.counters[key] = self.counters.get(key, 0) + number
+        finally:
+            self.lock.release()
+
+    def flush(self):
+        '''writes the samples waiting to be exported'''
+        self.lock.acquire()
+        try:
+            self._flush()
+        finally:
+            self.lock.release()
+
+    def _flush(self):
+        if not self.exported:
+            return
+        samples, self.exported = self.exported, []
+        try:
+            output = open(self.export_path, 'a')
+            try:
+                for sample in samples:
+                    output.write(json.dumps(sample, sort_keys=True) + '\n')
+            finally:
+                output.close()
+        except (IOError, OSError), excp:
+            print 'SublimeLint: cannot export statistics (%s)' % excp
+
+    def clear(self):
+        '''forgets all timings and counters'''
+        self.lock.acquire()
+        try:
+            self.histograms.clear()
+            self.counters.clear()
+        finally:
+            self.lock.release()
+
+    def report(self):
+        '''returns the statistics as text, one table per linter'''
+        self.lock.acquire()
+        try:
+            summaries = dict((key, (histogram.summary(), histogram.buckets()))
+                             for key, histogram in self.histograms.items())
+            counters = dict(self.counters)
+        finally:
+            self.lock.release()
+
+        linters = sorted(set([linter for linter, _ in summaries] +
+                             [linter for linter, _ in counters]))
+        bounds = ' '.join(['%5s' % ('<%d' % bound) for bound in BUCKETS] +
+                          ['%5s' % 'more'])
+        text = []
+        for linter in linters:
+            text.append(linter)
+            text.append('=' * len(linter))
+            names = sorted(name for owner, name in counters if owner == linter)
+            if names:
+                text.append(', '.join('%s: %d' % (name, counters[linter, name])
+                                      for name in names))
+            hits = counters.get((linter, 'cache hits'), 0)
+            misses = counters.get((linter, 'cache misses'), 0)
+            if hits + misses:
+                text.append('cache hit rate: %.0f%%' %
+                                        (100.0 * hits / (hits + misses)))
+            text.append('')
+            text.append('%-16s %7s %9s %9s %9s %9s %9s   %s' % ('phase (ms)',
+                        'count', 'mean', 'p50', 'p90', 'p99', 'max', bounds))
+            for (owner, phase) in sorted(summaries):
+                if owner != linter:
+                    continue
+                summary, buckets = summaries[owner, phase]
+                summary['phase'] = phase
+                text.append(('%(phase)-16s %(count)7d %(mean)9.2f %(p50)9.2f '
+                             '%(p90)9.2f %(p99)9.2f %(max)9.2f   ' % summary) +
+                            ' '.join('%5d' % number for number in buckets))
+            text.append('')
+        if not text:
+            text.append('No linter has run yet.')
+        return '\n'.join(text)
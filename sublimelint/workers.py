@@ -0,0 +1,65 @@
+'''A small pool of threads on which linters are run, so that the editor's
+main thread is not blocked while some code is being analyzed.
+
+Threads are used rather than processes: the interpreter embedded in
+Sublime Text cannot spawn helper Python processes, and the slowest
+linters spend most of their time waiting on external programs anyway.
+'''
+import Queue
+import threading
+import traceback
+
+
+class WorkerPool(object):
+    '''runs submitted jobs on a fixed number of daemon threads'''
+    def __init__(self, size=2):
+        self.jobs = Queue.Queue()
+        self.threads = []
+        for number in range(size):
+            worker = threading.Thread(target=self.work,
+                                      name='sublimelint-worker-%d' % number)
+            worker.setDaemon(True)
+            worker.start()
+            self.threads.append(worker)
+
+    def submit(self, function, *args):
+        '''schedules function(*args) to be called on a worker thread'''
+        self.jobs.put((function, args))
+
+    def work(self):
+        '''main loop of a worker thread'''
+        while True:
+            function, args = self.jobs.get()
+            try:
+                function(*args)
+            except Exception:
+                traceback.print_exc()
+
+
+class Countdown(object):
+    '''calls a function once the jobs submitted for something are over;
+       it starts with a count of one, for the code submitting them, which
+       must call done() once all of them are submitted'''
+    def __init__(self, function):
+        self.function = function
+        self.count = 1
+        self.lock = threading.Lock()
+
+    def add(self):
+        '''counts a new job'''
+        self.lock.acquire()
+        try:
+            self.count += 1
+        finally:
+            self.lock.release()
+
+    def done(self):
+        '''signals the end of a job'''
+        self.lock.acquire()
+        try:
+            self.count -= 1
+            over = not self.count
+        finally:
+            self.lock.release()
+        if over:
+            self.function()
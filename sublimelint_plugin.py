@@ -7,27 +7,49 @@ view.run_command("lint", "on")
 
 Questions: andre.roberge (at) gmail.com
 '''
+import functools
+import itertools
 import os
-import time
 import thread
+import time
 
 import sublime
 import sublime_plugin
 
+from sublimelint.cache import ResultCache, make_key
+from sublimelint.debounce import CostModel
+from sublimelint.lineindex import index_for
 from sublimelint.loader import Loader
-
-# TODO: experiment with including non-ascii characters - the Python linter
-# apparently raises some exceptions and may stop because of that. 
-# If so, fix it!
+from sublimelint.processes import RUNNER, ProcessCancelled, ProcessTimeout
+from sublimelint.scheduler import Scheduler, ACTIVE, VISIBLE, BACKGROUND
+from sublimelint.stats import Stats
+from sublimelint.workers import Countdown, WorkerPool
 
 LINTERS = {} # mapping of language name to linter module
-QUEUE = {}     # views waiting to be processed by linter
 ERRORS = {} # error messages on given line obtained from linter; they are
             # displayed in the status bar when cursor is on line with error
 HELP = []   # collects all "help" (docstring, etc.) information
+RESULTS = ResultCache() # results of previous linter runs, keyed by content
+INCREMENTAL = {} # (view id, language) -> state kept by incremental linters
+                 # for the views which are shown; see view_analyzer()
+DIAGNOSTICS = {} # view id -> {linter language: (generation, error messages)}
+STATS = Stats() # timings of the linter runs; see view.run_command("lint", "stats")
+COSTS = CostModel() # expected running time of the linters, for their delays
 MOD_LOAD = Loader(os.getcwd(), LINTERS, HELP) # utility to load (and reload 
             # if necessary) linter modules [useful when working on plugin]
 
+# Regions can be drawn underlined directly on editors which support it;
+# otherwise we use a "hack" specific to SublimeText where we create an empty
+# region for each character which we want to underline.  When drawing with
+# sublime.DRAW_EMPTY_AS_OVERWRITE, such empty regions will appear as
+# underlined.
+SOLID_UNDERLINE = hasattr(sublime, 'DRAW_SOLID_UNDERLINE')
+if SOLID_UNDERLINE:
+    UNDERLINE_FLAGS = (sublime.DRAW_SOLID_UNDERLINE | sublime.DRAW_NO_FILL |
+                                                    sublime.DRAW_NO_OUTLINE)
+else:
+    UNDERLINE_FLAGS = sublime.DRAW_EMPTY_AS_OVERWRITE
+
 HELP.insert(0, 
 '''SublimeLint help
 =================
@@ -44,6 +66,36 @@ down the UI too much, you can unset this user preference (or set it to
 false) and use the special commands (described below) to run it only
 on demand.
 
+Linters run on a small pool of worker threads, so that the editor is not
+blocked while the code is being analyzed; set the user preference
+"sublimelint_threaded" to false to run them on the main thread instead.
+
+Linters run in tiers, according to their cost: cheap checks (such as the
+syntax check of Python code, and the annotations) run as soon as the file
+is modified; the full analysis runs once the file has been left alone for
+"sublimelint_idle_delay" seconds (0.5 by default); slow linters such as
+pylint run when the file is saved, unless the user preference
+"sublimelint_save_tier" is false, and, if "sublimelint_long_idle_delay" is
+set, once the file has been left alone for that many seconds.  The
+messages of all the linters of a file are shown together.
+
+These delays grow with what the linters are expected to take on the file,
+based on their previous runs: a tier of linters waits for
+"sublimelint_debounce_factor" (2 by default) times its expected running
+time, up to "sublimelint_max_delay" seconds (5 by default), so that slow
+linters on large files do not keep running while you type.
+
+The file you are looking at is linted first, then the other visible
+files, then the other tabs; at most "sublimelint_background_runs" (1 by
+default) files which are not visible are linted at once - set it to 0 to
+lint files only once they are shown.
+
+Large files - more than "sublimelint_large_file_size" characters (256 KB
+by default) or "sublimelint_large_file_lines" lines (5000 by default) -
+show the annotations in sight as soon as they are opened, before the
+whole file is scanned.  Files of more than "sublimelint_max_file_size"
+characters (2 MB by default) are only scanned for annotations.
+
 When an "error" is highlighted by the linter, putting the cursor on the
 offending line will result in the error message being displayed on the
 status bar.
@@ -93,99 +145,437 @@ def help_collector(fn):
     HELP.append(fn.__doc__)
     return fn
 
-def background_run(linter, view):
-    '''run a linter on a given view if settings is set appropriately'''
-    if view.settings().get('sublimelint'):
-        if linter:
-            run_once(linter, view)
-    if view.settings().get('sublimelint_notes'):
-        highlight_notes(view)
-
-def run_once(linter, view):
-    '''run a linter on a given view regardless of user setting'''
-    if linter == LINTERS["annotations"]:
-        highlight_notes(view)
-        return
+# linters run on every modification, once the view is left alone, and when
+# it is saved; see the "tier" of the linter modules
+TIERS = ('keystroke', 'idle', 'save')
+
+def background_run(view, generation=None, tiers=('keystroke', 'idle'),
+                                                            countdown=None):
+    '''run the linters of the given tiers on a view if settings are set
+       appropriately'''
+    settings = view.settings()
+    huge = settings.get('sublimelint') and too_large(view)
+    if huge:
+        erase_lint_marks(view)
+        sublime.status_message('SublimeLint: file too large to be linted')
+    for tier in tiers:
+        if settings.get('sublimelint') and not huge:
+            if tier != 'save' or settings.get('sublimelint_save_tier', True):
+                for linter in tier_linters(view, tier):
+                    run_once(linter, view, generation, countdown)
+        if (settings.get('sublimelint_notes') and
+                getattr(LINTERS["annotations"], 'tier', 'idle') == tier):
+            highlight_notes(view, generation, countdown)
+
+def large_file(view):
+    '''True if a view is large enough for its annotations to be drawn
+       starting with the part in sight when it is first scanned'''
+    settings = view.settings()
+    size = view.size()
+    return (size > settings.get('sublimelint_large_file_size', 256 * 1024)
+            or view.rowcol(size)[0] >= settings.get(
+                                        'sublimelint_large_file_lines', 5000))
+
+def too_large(view):
+    '''True if a view is too large to be analyzed by the linters which
+       need the whole file'''
+    return view.size() > view.settings().get('sublimelint_max_file_size',
+                                                            2 * 1024 * 1024)
+
+def in_sight(view):
+    '''(begin, end) span of the whole lines visible in a view'''
+    visible = view.visible_region()
+    return (view.full_line(visible.begin()).begin(),
+            view.full_line(visible.end()).end())
+
+def tier_linters(view, tier):
+    '''the linters of a tier which apply to a view; the check_syntax()
+       of a linter module is a linter of the keystroke tier'''
+    linters = []
+    for linter in select_linters(view):
+        if getattr(linter, 'tier', 'idle') == tier:
+            linters.append(linter)
+        if tier == 'keystroke' and hasattr(linter, 'check_syntax'):
+            linters.append(SyntaxCheck(linter))
+    return linters
+
+class SyntaxCheck(object):
+    '''the check_syntax() function of a linter module, presented as a
+       linter module of its own'''
+    def __init__(self, module):
+        self.__name__ = module.__name__ + '.check_syntax'
+        self.__file__ = module.__file__
+        self.language = syntax_source(module.language)
+        self.analyze = module.check_syntax
+        self.settings = getattr(module, 'settings', ())
+        self.version = getattr(module, 'version', None)
+
+def syntax_source(language):
+    '''name under which the results of check_syntax() are displayed'''
+    return language + ' syntax'
+
+def run_once(linter, view, generation=None, countdown=None):
+    '''run a linter on a given view regardless of user setting;
+       if a generation is given, the results are discarded when the
+       view has been modified since that generation was queued; the
+       run is counted in countdown (a workers.Countdown), if any, until
+       its analysis is over'''
+    start = time.time()
     vid = view.id()
     text = view.substr(sublime.Region(0, view.size()))
     if view.file_name():
         filename = view.file_name()
     else:
         filename = 'untitled'
-    underlines, lines, ERRORS[vid] = linter.run(text, view, filename)
-    add_lint_marks(view, underlines, lines)
-
-
-def add_lint_marks(view, underlines, lines):
+    options = linter_options(linter, view)
+    STATS.export_to(view.settings().get('sublimelint_stats_file'))
+    STATS.since(linter.language, 'snapshot', start)
+    if view.settings().get('sublimelint_threaded', True):
+        if countdown is not None:
+            countdown.add()
+        WORKERS.submit(analyze_in_background, linter, view, vid, generation,
+                            text, filename, options, time.time(), countdown)
+    else:
+        result = lint_snapshot(linter, vid, generation, text, filename, options)
+        if result is not None:
+            apply_results(linter, view, generation, result)
+
+def lint_snapshot(linter, vid, generation, text, filename, options):
+    '''runs the analysis part of a linter, unless the same text has
+       already been analyzed with the same settings, and returns the
+       positions to mark as absolute offsets in the text; returns None
+       if an external program had to be killed'''
+    language = linter.language
+    STATS.count(language, 'runs')
+    key = make_key(linter, text, filename, options)
+    result = RESULTS.get(key)
+    if result is None:
+        STATS.count(language, 'cache misses')
+        start = time.time()
+        RUNNER.bind(vid, generation)
+        try:
+            analyze = view_analyzer(linter, vid)
+            result = analyze(text, filename, options)
+        except ProcessCancelled:
+            STATS.count(language, 'cancelled')
+            return None
+        except ProcessTimeout, excp:
+            STATS.count(language, 'timeouts')
+            print 'SublimeLint:', excp
+            return None
+        finally:
+            RUNNER.unbind()
+        STATS.since(language, 'analyze', start)
+        COSTS.record(vid, language, len(text), time.time() - start)
+        RESULTS.put(key, result)
+    else:
+        STATS.count(language, 'cache hits')
+    if linter is LINTERS["annotations"]:
+        return result
+    start = time.time()
+    underlines, lines, error_messages = result
+    underlined, outlines = lint_marks(text, underlines, lines)
+    STATS.since(language, 'marks', start)
+    return underlined, outlines, error_messages
+
+def view_analyzer(linter, vid):
+    '''returns the analyze function to use for a view; linter modules
+       which can reuse the results of their previous run on the same view
+       provide an Incremental class, an instance of which is kept for
+       each view while it is shown.  That state can take many times the
+       size of the code (the parse trees of a Python module), so it is
+       not kept for the views in the background; see focus_views()'''
+    incremental = getattr(linter, 'Incremental', None)
+    if incremental is None:
+        return linter.analyze
+    key = vid, linter.language
+    if SCHEDULER.priority(vid) == BACKGROUND:
+        INCREMENTAL.pop(key, None)
+        return linter.analyze
+    state = INCREMENTAL.get(key)
+    if not isinstance(state, incremental):  # new view or reloaded module
+        state = INCREMENTAL[key] = incremental()
+    return state.analyze
+
+def lint_marks(text, underlines, lines):
+    '''converts the line based positions reported by a linter into
+       (start, end) spans of the text that was analyzed'''
+    index = index_for(text)
+    underlined = []
+    if underlines:
+        for lineno, spans in underlines.by_line().iteritems():
+            underlined.extend([(index.point(lineno, start),
+                                index.point(lineno, end))
+                                            for start, end in spans])
+    outlines = [index.full_line(lineno) for lineno in lines]
+    return underlined, outlines
+
+def linter_options(linter, view):
+    '''collects the view settings a linter module asks for, so that
+       they can be read from a worker thread'''
+    settings = view.settings()
+    return dict((name, settings.get(name))
+                        for name in getattr(linter, 'settings', ()))
+
+def analyze_in_background(linter, view, vid, generation, text, filename,
+                                            options, queued, countdown=None):
+    '''runs a linter on a snapshot of a view; called from a worker thread,
+       it only hands the results back to the main thread for display'''
+    try:
+        STATS.since(linter.language, 'queue wait', queued)
+        if not SCHEDULER.is_current(vid, generation):
+            return
+        result = lint_snapshot(linter, vid, generation, text, filename,
+                                                                    options)
+        if result is None:
+            return
+        sublime.set_timeout(functools.partial(apply_results, linter, view,
+                                        generation, result, time.time()), 0)
+    finally:
+        if countdown is not None:
+            countdown.done()
+
+def apply_results(linter, view, generation, result, finished=None):
+    '''displays the results of a linter, unless they are stale'''
+    if finished is not None:
+        STATS.since(linter.language, 'display wait', finished)
+    vid = view.id()
+    if not SCHEDULER.is_current(vid, generation):
+        STATS.count(linter.language, 'stale results')
+        return
+    if linter is LINTERS["annotations"]:
+        add_note_marks(view, result)
+    else:
+        underlined, outlines, error_messages = result
+        add_lint_marks(view, underlined, outlines, linter.language)
+        merge_diagnostics(view, linter.language, generation, error_messages)
+
+def merge_diagnostics(view, language, generation, error_messages):
+    '''keeps the error messages of a linter along with those of the other
+       linters of the view, and displays them all; the messages (and
+       marks) of the syntax check the linter supersedes are dropped'''
+    vid = view.id()
+    if generation is None:
+        generation = SCHEDULER.generation(vid)
+    sources = DIAGNOSTICS.setdefault(vid, {})
+    sources[language] = generation, error_messages
+    check = syntax_source(language)
+    if check in sources and sources[check][0] <= generation:
+        del sources[check]
+        erase_lint_marks(view, check)
+    merged = {}
+    for source in sorted(sources):
+        for lineno, found in sources[source][1].iteritems():
+            messages = merged.setdefault(lineno, [])
+            messages.extend([message for message in found
+                                            if message not in messages])
+    ERRORS[vid] = merged
+
+
+def lint_keys(language):
+    '''names of the regions marked by a linter'''
+    return 'lint-underline-' + language, 'lint-outlines-' + language
+
+def add_lint_marks(view, underlined, outlines, language='lint'):
     '''Adds lint marks to view.'''
-    erase_lint_marks(view)
+    erase_lint_marks(view, language)
+    underline_key, outline_key = lint_keys(language)
 
     highlight_theme_scope = "invalid.illegal"
-    if underlines:
-        view.add_regions('lint-underline', underlines, highlight_theme_scope, 
-                                            sublime.DRAW_EMPTY_AS_OVERWRITE)
-    if lines:
-        outlines = [view.full_line(view.text_point(nb, 0)) for nb in lines]
-        view.add_regions('lint-outlines', outlines, highlight_theme_scope, 
+    began = time.time()
+    underlined = underline_regions(underlined)
+    outlines = [sublime.Region(start, end) for start, end in outlines]
+    STATS.since(language, 'regions', began)
+    began = time.time()
+    if underlined:
+        view.add_regions(underline_key, underlined,
+                                    highlight_theme_scope, UNDERLINE_FLAGS)
+    if outlines:
+        view.add_regions(outline_key, outlines, highlight_theme_scope, 
                                                     sublime.DRAW_OUTLINED)
-
-def erase_lint_marks(view):
-    '''erase all "lint" error marks from view'''
-    view.erase_regions('lint-underline')
-    view.erase_regions('lint-outlines')
-
-
-def select_linter(view):
-    '''selects the appropriate linter to use based on language in 
-       current view'''
-    for language in LINTERS:
-        if language in view.settings().get("syntax"):
-            return LINTERS[language]
-    return None
-
-def highlight_notes(view):
-    '''highlight user-specified annotations in a file'''
+    STATS.since(language, 'add_regions', began)
+
+def underline_regions(underlined):
+    '''converts the merged (start, end) spans underlined by a linter
+       into regions'''
+    if SOLID_UNDERLINE:
+        return [sublime.Region(start, end) for start, end in underlined]
+    regions = []
+    for start, end in underlined:
+        regions.extend([sublime.Region(point) for point in xrange(start, end)])
+    return regions
+
+def erase_lint_marks(view, language=None):
+    '''erase the "lint" error marks of a linter from view, or all of them
+       (along with their messages) if no linter is given'''
+    if language is None:
+        DIAGNOSTICS.pop(view.id(), None)
+        ERRORS.pop(view.id(), None)
+        languages = LINTERS.keys() + [syntax_source(name)
+                                                for name in LINTERS]
+    else:
+        languages = [language]
+    for language in languages:
+        for key in lint_keys(language):
+            view.erase_regions(key)
+
+
+def select_linters(view):
+    '''selects the linters which apply to the language of the current
+       view; a linter module applies to the syntaxes named after its
+       "syntax" attribute, or its language by default'''
+    syntax = view.settings().get("syntax")
+    return [LINTERS[language] for language in sorted(LINTERS)
+                if getattr(LINTERS[language], 'syntax', language) in syntax]
+
+def highlight_notes(view, generation=None, countdown=None):
+    '''highlight user-specified annotations in a file; when a large file
+       is first scanned, the annotations in sight are drawn right away'''
+    linter = LINTERS["annotations"]
+    if large_file(view) and (view.id(), linter.language) not in INCREMENTAL:
+        # later scans only look at the lines which changed, see notes.py
+        begin, end = in_sight(view)
+        text = view.substr(sublime.Region(begin, end))
+        notes = linter.analyze(text, 'untitled', linter_options(linter, view))
+        add_note_marks(view, [(start + begin, stop + begin)
+                                            for start, stop in notes])
+    run_once(linter, view, generation, countdown)
+
+def add_note_marks(view, notes):
+    '''Adds annotation marks to view.'''
     view.erase_regions('annotations')
-    text = view.substr(sublime.Region(0, view.size()))
-    
-    regions = LINTERS["annotations"].run(text, view)
-    if regions:
+    if notes:
+        language = LINTERS["annotations"].language
+        began = time.time()
+        regions = [sublime.Region(start, end) for start, end in notes]
+        STATS.since(language, 'regions', began)
+        began = time.time()
         view.add_regions('annotations', regions, "sublimelint.annotations", 
                                             sublime.DRAW_EMPTY_AS_OVERWRITE)
-
-def queue_linter(view):
-    '''Put the current view in a queue to be examined by a linter'''
-    if select_linter(view) is None:
+        STATS.since(language, 'add_regions', began)
+
+def append_to_view(view, pieces, chunk_size=200):
+    '''appends the strings produced by "pieces" at the end of a view,
+       chunk_size of them at a time, from successive main thread
+       callbacks'''
+    chunk = list(itertools.islice(pieces, chunk_size))
+    if not chunk:
+        return
+    edit = view.begin_edit()
+    try:
+        view.insert(edit, view.size(), ''.join(chunk))
+    finally:
+        view.end_edit(edit)
+    sublime.set_timeout(functools.partial(append_to_view, view, pieces,
+                                                        chunk_size), 0)
+
+def queue_linter(view, saved=False):
+    '''Put the current view in the queue of each tier of linters, to be
+       examined by them once it has been left alone long enough'''
+    if not select_linters(view):
         erase_lint_marks(view)#may have changed file type and left marks behind
     #user annotations could be present in all types of files
-    QUEUE[view.id()] = view
+    for tier, delay in tier_delays(view, saved).iteritems():
+        SCHEDULER.queue(view, tier, delay)
+
+def tier_delays(view, saved=False):
+    '''seconds for which a view just modified (or saved) must be left
+       alone before each tier of linters runs on it: at least the delay
+       of the tier, longer for the linters expected to take long'''
+    settings = view.settings()
+    delays = {'keystroke': 0.0,
+              'idle': settings.get('sublimelint_idle_delay', 0.5)}
+    if settings.get('sublimelint_save_tier', True):
+        if saved:
+            delays['save'] = 0.0
+        elif settings.get('sublimelint_long_idle_delay') is not None:
+            delays['save'] = settings.get('sublimelint_long_idle_delay')
+    factor = settings.get('sublimelint_debounce_factor', 2.0)
+    maximum = settings.get('sublimelint_max_delay', 5.0)
+    for tier in delays:
+        if not (saved and tier == 'save'):
+            delays[tier] = COSTS.delay(view.id(), tier_languages(view, tier),
+                            view.size(), delays[tier], factor, maximum)
+        STATS.record('scheduler', '%s delay' % tier, delays[tier])
+    return delays
+
+def queue_opened(view):
+    '''Put a view which was just opened in the queue of the linters which
+       run as it is modified; it is examined according to its priority'''
+    for tier in ('keystroke', 'idle'):
+        SCHEDULER.queue(view, tier, 0.0)
+
+def focus_views():
+    '''tells the scheduler which view has the focus and which views are
+       shown, so that they are linted before the background tabs, and
+       drops the incremental state of the views no longer shown'''
+    active = None
+    visible = []
+    for window in sublime.windows():
+        for group in range(window.num_groups()):
+            view = window.active_view_in_group(group)
+            if view is not None:
+                visible.append(view.id())
+    window = sublime.active_window()
+    view = window and window.active_view()
+    if view is not None:
+        active = view.id()
+        background = view.settings().get('sublimelint_background_runs', 1)
+    else:
+        background = None
+    SCHEDULER.focus(active, visible, background)
+    for key in INCREMENTAL.keys():
+        if key[0] != active and key[0] not in visible:
+            INCREMENTAL.pop(key, None)
+
+def tier_languages(view, tier):
+    '''languages of the linters which run on a view for a tier'''
+    languages = [linter.language for linter in tier_linters(view, tier)]
+    notes = LINTERS["annotations"]
+    if (view.settings().get('sublimelint_notes') and
+                                    getattr(notes, 'tier', 'idle') == tier):
+        languages.append(notes.language)
+    return languages
+
+
+# counters of the runs of the scheduler, by priority of the view
+PRIORITY_RUNS = {ACTIVE: 'active view runs', VISIBLE: 'visible view runs',
+                 BACKGROUND: 'background runs'}
+
+def update_view(view, generation, tier, due=None):
+    '''runs a tier of linters on a queued view, unless it has been
+       modified again since it was queued'''
+    if due is not None:
+        STATS.since('scheduler', 'dispatch wait', due)
+    STATS.count('scheduler', PRIORITY_RUNS[SCHEDULER.priority(view.id())])
+    countdown = Countdown(functools.partial(SCHEDULER.finished, view.id(),
+                                                                    tier))
+    try:
+        if SCHEDULER.is_current(view.id(), generation):
+            background_run(view, generation, (tier,), countdown)
+    except RuntimeError, excp:
+        print excp
+    finally:
+        countdown.done()
 
 
 def background_linter():
-    '''An infinite loop meant to periodically
-       update the view after running the linter in a background thread
-       so as to not slow down the UI too much.'''
+    '''An infinite loop waiting for views to be queued, and then
+       updating them through the main thread as soon as they have
+       been left unmodified for a short while.'''
     while True:
-        time.sleep(0.5)
-        for vid in dict(QUEUE):
-            _view = QUEUE[vid]
-            def _update_view():
-                linter = select_linter(_view)
-                try:
-                    background_run(linter, _view)
-                except RuntimeError, excp:
-                    print excp
-            sublime.set_timeout(_update_view, 100)
-            try: 
-                del QUEUE[vid]
-            except: 
-                pass
+        view, generation, tier = SCHEDULER.wait()
+        sublime.set_timeout(functools.partial(update_view, view, generation,
+                                                    tier, time.time()), 0)
 
 
 # only start the thread once - otherwise the plugin will get laggy 
-# when saving it often
+# when saving it often; the scheduler must survive reloads as well since
+# the thread keeps waiting on it
 if not '__active_linter_thread' in globals():
     __active_linter_thread = True
+    SCHEDULER = Scheduler()
+    WORKERS = WorkerPool()
     thread.start_new_thread(background_linter, ())
 
 
@@ -225,6 +615,10 @@ class Lint(sublime_plugin.TextCommand):
             self.on()
         elif lc_name == "off":
             self.off()
+        elif lc_name == "cache":
+            self.cache()
+        elif lc_name == "stats":
+            self.stats()
         elif name in LINTERS:
             self._run(name)
         else:
@@ -287,6 +681,31 @@ class Lint(sublime_plugin.TextCommand):
         '''
         self.view.settings().set('sublimelint', False)
 
+    @help_collector
+    def cache(self):
+        '''* view.run_command("lint", "cache")
+        Shows in the status bar how often the results of a previous
+        run could be reused instead of running the linter again.
+        '''
+        stats = RESULTS.stats()
+        stats['hit_rate'] *= 100
+        sublime.status_message('SublimeLint cache: %(hits)d hits, '
+                '%(misses)d misses (%(hit_rate).0f%%), %(entries)d entries, '
+                '%(bytes)d bytes' % stats)
+
+    @help_collector
+    def stats(self):
+        '''* view.run_command("lint", "stats")
+        Displays in a new tab how long each linter took recently, phase
+        by phase (in milliseconds), with the number of runs and cache
+        hits.  Set the user preference "sublimelint_stats_file" to a
+        path to also have every measure appended to that file, one JSON
+        object per line.
+        '''
+        STATS.flush()
+        self.view_in_tab("SublimeLint statistics", STATS.report(),
+                                    "Packages/Text/Plain text.tmLanguage")
+
     def _run(self, name):
         '''runs an existing linter'''
         if self.view.settings().get('sublimelint'):
@@ -322,11 +741,14 @@ class Annotations(Lint):
     def extract_from_current_view(self):
         text = self.view.substr(sublime.Region(0, self.view.size()))
         filename = self.view.file_name()
-        notes = LINTERS["annotations"].extract_annotations(text, self.view, filename)
+        notes = LINTERS["annotations"].iter_annotations(text, self.view, filename)
         _, filename = os.path.split(filename)
         annotations_view, _id = self.view_in_tab("Annotations from %s" % 
-                                                    filename, notes,
+                                                    filename, "",
                                                 "Packages/sublime_orgmode/orgmode.tmLanguage")
+        # large files can have thousands of annotations: they are shown as
+        # they are extracted, letting the editor respond in between
+        append_to_view(annotations_view, notes)
 
 
 class BackgroundLinter(sublime_plugin.EventListener):
@@ -336,13 +758,20 @@ class BackgroundLinter(sublime_plugin.EventListener):
     via a user-defined settings.
     '''
     def on_modified(self, view):
+        generation = SCHEDULER.bump(view)
+        RUNNER.cancel(view.id(), generation)
         queue_linter(view)
         return
     
     def on_load(self, view):
-        linter = select_linter(view)
-        if linter:
-            background_run(linter, view)
+        focus_views()
+        if select_linters(view):
+            queue_opened(view)
+
+    def on_activated(self, view):
+        focus_views()
+        if select_linters(view) and not SCHEDULER.known(view.id()):
+            queue_opened(view)   # opened before the plugin was loaded
     
     def on_post_save(self, view):
         for name, module in LINTERS.items():
@@ -350,8 +779,18 @@ class BackgroundLinter(sublime_plugin.EventListener):
                 print 'SublimeLint - Reloading language:', module.language
                 MOD_LOAD.reload_module(module)
                 break
-        queue_linter(view)
+        queue_linter(view, saved=True)
     
+    def on_close(self, view):
+        SCHEDULER.forget(view.id())
+        RUNNER.forget(view.id())
+        ERRORS.pop(view.id(), None)
+        DIAGNOSTICS.pop(view.id(), None)
+        COSTS.forget(view.id())
+        for key in INCREMENTAL.keys():
+            if key[0] == view.id():
+                del INCREMENTAL[key]
+
     def on_selection_modified(self, view):
         vid = view.id()
         lineno = view.rowcol(view.sel()[0].end())[0]